@@ -48,8 +48,9 @@ class RecipeAdmin(admin.ModelAdmin):
     ]
     empty_value_display = settings.EMPTY_FIELD
 
+    @admin.display(description='в избранном')
     def count_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(UserRecipeShoppingCart)
@@ -0,0 +1,162 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import redirect
+from django.urls import reverse
+from rest_framework.exceptions import (NotAuthenticated, NotFound,
+                                       ValidationError)
+
+from core.async_views import (AsyncPageNumberPagination, AsyncReadView,
+                              json_response, run_concurrently)
+from core.mixins import get_snapshot, snapshot_response
+from users.models import CustomUser
+from users.serializers import GetSubscriptionsSerializer
+from users.utils import get_recipes_limit
+
+from .fast_serializers import FastRecipeSerializer
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .membership import membership
+from .models import Ingredient, Recipe, Tag
+from .serializers import IngredientSerializer, RecipeSerializer, TagSerializer
+from .short_links import resolve_short_link
+
+
+def get_membership_ids(user, kind):
+    if not user.is_authenticated:
+        return frozenset()
+    return membership.recipe_ids(user, kind)
+
+
+def serialize_recipes(request, recipes, favorited_ids, cart_ids, many):
+    serializer_class = (
+        FastRecipeSerializer if settings.FAST_READ_SERIALIZERS
+        else RecipeSerializer
+    )
+    return serializer_class(
+        recipes,
+        many=many,
+        context={
+            'request': request,
+            'favorited_ids': favorited_ids,
+            'cart_ids': cart_ids,
+        },
+    ).data
+
+
+class AsyncRecipeListView(AsyncReadView):
+    """
+    Асинхронный список рецептов с теми же фильтрами и пагинацией, что у
+    RecipeViewSet: строки страницы, count и id избранного и корзины
+    запрашиваются одновременно.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        paginator = AsyncPageNumberPagination(request)
+        queryset = await sync_to_async(self.filter_queryset)(request)
+        rows, count, favorited_ids, cart_ids = await run_concurrently(
+            lambda: list(paginator.slice(queryset)),
+            queryset.count,
+            lambda: get_membership_ids(user, 'favorites'),
+            lambda: get_membership_ids(user, 'cart'),
+        )
+        results = await sync_to_async(serialize_recipes)(
+            request, rows, favorited_ids, cart_ids, many=True
+        )
+        return paginator.get_response(count, results)
+
+    def filter_queryset(self, request):
+        queryset = Recipe.objects.with_read_plan(request.user).order_by(
+            '-pub_date', '-id'
+        )
+        filterset = RecipeFilter(
+            request.GET, queryset=queryset, request=request
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return filterset.qs
+
+
+class AsyncRecipeDetailView(AsyncReadView):
+    """Асинхронная страница рецепта."""
+
+    async def get(self, request, pk, *args, **kwargs):
+        user = request.user
+        recipe, favorited_ids, cart_ids = await run_concurrently(
+            Recipe.objects.with_read_plan(user).filter(pk=pk).first,
+            lambda: get_membership_ids(user, 'favorites'),
+            lambda: get_membership_ids(user, 'cart'),
+        )
+        if recipe is None:
+            raise NotFound()
+        return json_response(await sync_to_async(serialize_recipes)(
+            request, recipe, favorited_ids, cart_ids, many=False
+        ))
+
+
+class AsyncTagListView(AsyncReadView):
+    """Асинхронный снимок тегов (см. VersionedSnapshotListMixin)."""
+
+    async def get(self, request, *args, **kwargs):
+        snapshot = await sync_to_async(get_snapshot)(
+            'tags',
+            lambda: TagSerializer(Tag.objects.all(), many=True).data,
+        )
+        return snapshot_response(request, snapshot)
+
+
+class AsyncIngredientListView(AsyncReadView):
+    """Асинхронный снимок ингредиентов и поиск по префиксу названия."""
+
+    async def get(self, request, *args, **kwargs):
+        name = request.GET.get('name')
+        if name:
+            return json_response(
+                await sync_to_async(ingredient_index.search)(name)
+            )
+        snapshot = await sync_to_async(get_snapshot)(
+            'ingredients',
+            lambda: IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data,
+        )
+        return snapshot_response(request, snapshot)
+
+
+class AsyncSubscriptionsView(AsyncReadView):
+    """Асинхронный список подписок: страница и count одновременно."""
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        if not user.is_authenticated:
+            raise NotAuthenticated()
+        paginator = AsyncPageNumberPagination(
+            request, settings.SUBSCRIPTIONS_PAGE_SIZE
+        )
+        subscriptions = CustomUser.objects.filter(
+            subscriptions__subscribers=user
+        )
+        rows, count = await run_concurrently(
+            lambda: list(paginator.slice(
+                subscriptions.with_subscription_data(
+                    user, get_recipes_limit(request)
+                )
+            )),
+            subscriptions.count,
+        )
+        results = await sync_to_async(
+            lambda: GetSubscriptionsSerializer(
+                rows, many=True, context={'request': request}
+            ).data
+        )()
+        return paginator.get_response(count, results)
+
+
+class AsyncRecipeRedirectView(AsyncReadView):
+    """Асинхронный редирект по короткой ссылке."""
+
+    async def get(self, request, short_link, *args, **kwargs):
+        recipe_id = await sync_to_async(resolve_short_link)(short_link)
+        if recipe_id is None:
+            raise NotFound('Рецепт не найден.')
+        return redirect(reverse('recipes-detail', kwargs={'pk': recipe_id}))
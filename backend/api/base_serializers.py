@@ -1,16 +1,21 @@
 from rest_framework import serializers
 
+from users.utils import ImageVariantsField
+
 from .models import Recipe
 
 
 class BaseRecipeSerializer(serializers.ModelSerializer):
     """Базовый сериализатор для представления рецепта."""
 
+    image_srcset = ImageVariantsField(source='image_variants')
+
     class Meta:
         model = Recipe
         fields = [
             'id',
             'name',
             'image',
+            'image_srcset',
             'cooking_time'
         ]
@@ -0,0 +1,31 @@
+from django.db import transaction
+
+from core.versioning import bump_data_version
+
+# Теги кеша ответов рецептов (core.response_cache): список рецептов,
+# данные авторов и каждый рецепт отдельно.
+RECIPES_TAG = 'recipes'
+AUTHORS_TAG = 'authors'
+
+
+def recipe_tag(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Сбрасывает кеш списков рецептов и страниц рецептов recipe_ids после
+    фиксации транзакции: иначе параллельный запрос успел бы сохранить
+    старые данные под новой версией.
+    """
+    tags = [RECIPES_TAG, *(recipe_tag(recipe_id) for recipe_id in recipe_ids)]
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def invalidate_authors():
+    transaction.on_commit(lambda: _bump([AUTHORS_TAG]))
+
+
+def _bump(tags):
+    for tag in tags:
+        bump_data_version(tag)
@@ -0,0 +1,50 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.counters import change_counter, counted_by_signals
+from users.models import CustomUser, Subscription
+
+from .models import FavoriteRecipe, Recipe, UserRecipeShoppingCart
+
+# Счетчик рецепта, который меняется при добавлении в избранное/корзину.
+MEMBERSHIP_COUNTERS = {
+    'favorites': 'favorites_count',
+    'cart': 'cart_count',
+}
+
+# Денормализованные счетчики: (модель, поле, что считаем, FK на модель).
+# Вставку и удаление отдельных строк, в том числе каскадное, учитывают
+# обработчики сигналов в api/signals.py.
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'cart_count', UserRecipeShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'subscribers_count', Subscription, 'subscriptions'),
+)
+
+
+def actual_count(source, foreign_key):
+    """Коррелированный подзапрос с фактическим значением счетчика."""
+    counted = source.objects.filter(
+        **{foreign_key: OuterRef('pk')}
+    ).order_by().values(foreign_key).annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def update_counters(source, instance, delta, origin=None):
+    """
+    Меняет на delta счетчики, которые считают строки source, после
+    вставки или удаления строки instance. Счетчик объекта, с удаления
+    которого началось каскадное удаление (origin), не трогается.
+    """
+    if not counted_by_signals():
+        return
+    for model, field, counted, foreign_key in COUNTERS:
+        if counted is not source:
+            continue
+        pk = getattr(instance, f'{foreign_key}_id')
+        if isinstance(origin, model) and origin.pk == pk:
+            continue
+        change_counter(model, pk, field, delta)
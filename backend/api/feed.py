@@ -0,0 +1,202 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from core.pagination import KeysetLimitPagination, keyset_filter
+from users.models import CustomUser, Subscription
+
+from .models import FeedEntry, Recipe
+
+# Размер пачки при вставке записей и обрезке лент.
+BATCH_SIZE = 1000
+
+
+def is_fanned_in(author_id):
+    """
+    Рецепты авторов с большим числом подписчиков не раскладываются
+    по лентам, а подмешиваются при чтении. Число подписчиков читается
+    из БД: счетчик в загруженном объекте автора мог устареть.
+    """
+    return CustomUser.objects.filter(
+        pk=author_id,
+        subscribers_count__gt=settings.FEED['FAN_OUT_LIMIT'],
+    ).exists()
+
+
+def add_feed_entries(subscriber_ids, author_id, recipes):
+    """Добавляет рецепты (id, pub_date) автора в ленты подписчиков."""
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=subscriber_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for subscriber_id in subscriber_ids
+            for recipe_id, pub_date in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim_feeds(subscriber_ids)
+
+
+def recent_recipes(author_id):
+    """Последние FEED['MAX_ENTRIES'] рецептов автора: (id, pub_date)."""
+    return list(
+        Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:settings.FEED['MAX_ENTRIES']]
+    )
+
+
+def subscriber_ids_of(author_id):
+    return list(
+        Subscription.objects.filter(
+            subscriptions_id=author_id
+        ).values_list('subscribers_id', flat=True)
+    )
+
+
+def publish_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора (fan-out)."""
+    if is_fanned_in(recipe.author_id):
+        return
+    add_feed_entries(
+        subscriber_ids_of(recipe.author_id),
+        recipe.author_id,
+        [(recipe.id, recipe.pub_date)],
+    )
+
+
+def follow(subscriber_id, author):
+    """Заполняет ленту нового подписчика последними рецептами автора."""
+    if is_fanned_in(author.id):
+        return
+    add_feed_entries([subscriber_id], author.id, recent_recipes(author.id))
+
+
+def unfollow(subscriber_id, author_id):
+    """
+    Убирает рецепты автора из ленты бывшего подписчика. Если подписчиков
+    у автора стало ровно FEED['FAN_OUT_LIMIT'], его рецепты снова
+    раскладываются по лентам, и последние из них, опубликованные, пока
+    он подмешивался при чтении, добавляются в ленты всех подписчиков.
+    """
+    FeedEntry.objects.filter(
+        user_id=subscriber_id, author_id=author_id
+    ).delete()
+    if CustomUser.objects.filter(
+        pk=author_id, subscribers_count=settings.FEED['FAN_OUT_LIMIT']
+    ).exists():
+        add_feed_entries(
+            subscriber_ids_of(author_id), author_id, recent_recipes(author_id)
+        )
+
+
+def trim_feeds(user_ids):
+    """Оставляет в лентах пользователей не больше FEED['MAX_ENTRIES']."""
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        stale_ids = list(
+            FeedEntry.objects.filter(
+                user_id__in=user_ids[start:start + BATCH_SIZE]
+            ).annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F('user_id'),
+                    order_by=(F('pub_date').desc(), F('recipe_id').desc()),
+                )
+            ).filter(
+                position__gt=settings.FEED['MAX_ENTRIES']
+            ).values_list('id', flat=True)
+        )
+        if stale_ids:
+            FeedEntry.objects.filter(id__in=stale_ids).delete()
+
+
+def fill_feed(user_id):
+    """Строит ленту пользователя заново по его подпискам."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    recipes = Recipe.objects.filter(
+        author__subscriptions__subscribers=user_id,
+        author__subscribers_count__lte=settings.FEED['FAN_OUT_LIMIT'],
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'author_id', 'pub_date'
+    )[:settings.FEED['MAX_ENTRIES']]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, author_id, pub_date in recipes
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def rebuild_feeds():
+    """
+    Перестраивает ленты всех пользователей. Нужна после вставки подписок
+    и рецептов в обход сигналов. Возвращает число пользователей.
+    """
+    FeedEntry.objects.all().delete()
+    subscriber_ids = Subscription.objects.order_by(
+        'subscribers_id'
+    ).values_list('subscribers_id', flat=True).distinct()
+    rebuilt = 0
+    for subscriber_id in subscriber_ids.iterator():
+        fill_feed(subscriber_id)
+        rebuilt += 1
+    return rebuilt
+
+
+def feed_keys(user, cursor, reverse, limit):
+    """
+    Возвращает до limit ключей (pub_date, id рецепта) ленты после
+    курсора: записи ленты читаются одним проходом по индексу, рецепты
+    популярных авторов — отдельным запросом, и обе части сливаются.
+    """
+    entries = keyset_filter(
+        FeedEntry.objects.filter(user=user), cursor, reverse, 'recipe_id'
+    ).values_list('pub_date', 'recipe_id')[:limit]
+    fanned_in = keyset_filter(
+        Recipe.objects.filter(
+            author__in=CustomUser.objects.filter(
+                subscriptions__subscribers=user,
+                subscribers_count__gt=settings.FEED['FAN_OUT_LIMIT'],
+            )
+        ),
+        cursor,
+        reverse,
+    ).values_list('pub_date', 'id')[:limit]
+    # Автор мог стать популярным, когда его рецепты уже были в ленте.
+    keys = set(entries) | set(fanned_in)
+    return sorted(keys, reverse=not reverse)[:limit]
+
+
+class FeedPagination(KeysetLimitPagination):
+    """
+    Пагинация ленты подписок: всегда по курсору (pub_date, id), без
+    номеров страниц и count. Кверисет задает, как загружать рецепты
+    страницы.
+    """
+
+    def use_cursor(self, request):
+        return True
+
+    def get_count(self, queryset, request):
+        return None
+
+    def get_keyset_page(self, queryset, cursor, reverse):
+        keys = feed_keys(
+            self.request.user, cursor, reverse, self.page_size + 1
+        )
+        recipes = queryset.in_bulk([recipe_id for _, recipe_id in keys])
+        return [
+            recipes[recipe_id] for _, recipe_id in keys
+            if recipe_id in recipes
+        ]
@@ -1,8 +1,20 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from api.models import Ingredient, Recipe, Tag
+from api.models import Ingredient, Recipe
+from api.search import search_recipes
+from api.tag_slugs import tag_slug_map
 from users.models import CustomUser
 
+TAGS_ANY = 'any'
+TAGS_ALL = 'all'
+TAGS_MODES = (
+    (TAGS_ANY, 'любой из тегов'),
+    (TAGS_ALL, 'все теги'),
+)
+
 
 class IngredientFilter(filters.FilterSet):
     """Кастомная Фильтрация тегов"""
@@ -20,14 +32,56 @@ class IngredientFilter(filters.FilterSet):
         fields = ('name',)
 
 
+class TagSlugsField(forms.Field):
+    """
+    Принимает несколько слагов тегов и возвращает их id по словарю
+    tag_slug_map, не обращаясь к БД.
+    """
+
+    widget = forms.SelectMultiple
+    default_error_messages = {
+        'invalid_choice': (
+            forms.ModelMultipleChoiceField.default_error_messages[
+                'invalid_choice'
+            ]
+        ),
+    }
+
+    def to_python(self, value):
+        if not value:
+            return []
+        mapping = tag_slug_map.get_mapping()
+        tag_ids = []
+        for slug in value:
+            if slug not in mapping:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': slug},
+                )
+            tag_ids.append(mapping[slug])
+        return tag_ids
+
+
+class TagSlugsFilter(filters.Filter):
+    field_class = TagSlugsField
+
+
 class RecipeFilter(filters.FilterSet):
     """Кастомная фильтрации рецептов."""
 
     author = filters.ModelChoiceFilter(queryset=CustomUser.objects.all())
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
-        to_field_name='slug',
+    tags = TagSlugsFilter(
+        method='filter_tags',
+        help_text='Слаги тегов; параметр можно передать несколько раз',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='filter_tags_mode',
+        help_text=(
+            'any — рецепты с любым из тегов (по умолчанию), '
+            'all — рецепты со всеми тегами'
+        )
     )
     is_favorited = filters.BooleanFilter(
         field_name='is_favorited',
@@ -37,6 +91,13 @@ class RecipeFilter(filters.FilterSet):
         field_name='is_in_shopping_cart',
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='filter_search',
+        help_text=(
+            'Полнотекстовый поиск по названию и описанию рецепта '
+            'с сортировкой по релевантности'
+        )
+    )
 
     class Meta:
         model = Recipe
@@ -45,18 +106,43 @@ class RecipeFilter(filters.FilterSet):
             'tags',
         )
 
-    def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if value is True and user.is_authenticated:
-            return queryset.filter(is_favorited=user)
-        if value is False and user.is_authenticated:
-            return queryset.exclude(is_favorited=user)
+    def filter_tags(self, queryset, name, value):
+        """
+        Фильтрует подзапросами EXISTS по связующей таблице: рецепт с
+        несколькими подходящими тегами не дублируется, DISTINCT не нужен.
+        """
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk')
+        )
+        if self.form.cleaned_data.get('tags_mode') == TAGS_ALL:
+            for tag_id in set(value):
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id=tag_id))
+                )
+            return queryset
+        return queryset.filter(Exists(recipe_tags.filter(tag_id__in=value)))
+
+    def filter_tags_mode(self, queryset, name, value):
+        # Режим учитывается в filter_tags.
         return queryset
 
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_by_user_flag(queryset, 'user_favorited', value)
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self._filter_by_user_flag(queryset, 'user_in_cart', value)
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def _filter_by_user_flag(self, queryset, flag, value):
+        """
+        Фильтрует по аннотации из RecipeQuerySet.with_user_flags,
+        не добавляя к запросу JOIN по связующим таблицам.
+        """
         user = self.request.user
-        if value is True and user.is_authenticated:
-            return queryset.filter(is_in_shopping_cart=user)
-        if value is False and user.is_authenticated:
-            return queryset.exclude(is_favorited=user)
-        return queryset
+        if value is None or not user.is_authenticated:
+            return queryset
+        if flag not in queryset.query.annotations:
+            queryset = queryset.with_user_flags(user)
+        return queryset.filter(**{flag: value})
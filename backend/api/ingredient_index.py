@@ -0,0 +1,88 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+from core.versioning import bump_data_version, get_data_version
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """
+    Префиксный индекс ингредиентов в памяти процесса.
+
+    Хранит отсортированные по casefold названия и отдельные слова
+    названий, поэтому поиск по префиксу — это bisect без обращения к БД.
+    Индекс перестраивается, когда меняется версия в общем кеше.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._snapshot = None
+
+    def search(self, query, limit=None):
+        """
+        Ищет ингредиенты по префиксу без учета регистра.
+
+        Сначала идет точное совпадение, затем названия, начинающиеся с
+        query, затем названия, в которых с query начинается другое слово.
+        """
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        query = query.casefold()
+        rows, *key_tables = self._get_snapshot()
+        found = []
+        seen = set()
+        for keys, positions in key_tables:
+            index = bisect_left(keys, query)
+            while (
+                len(found) < limit
+                and index < len(keys)
+                and keys[index].startswith(query)
+            ):
+                position = positions[index]
+                if position not in seen:
+                    seen.add(position)
+                    found.append(rows[position])
+                index += 1
+        return found
+
+    def _get_snapshot(self):
+        version = get_data_version('ingredients')
+        snapshot = self._snapshot
+        if snapshot is not None and version == self._version:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or version != self._version:
+                self._snapshot = self._build()
+                self._version = version
+            return self._snapshot
+
+    def _build(self):
+        rows = list(
+            Ingredient.objects.order_by('name').values(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        names = []
+        words = []
+        for position, row in enumerate(rows):
+            name = row['name'].casefold()
+            names.append((name, position))
+            words.extend((word, position) for word in name.split()[1:])
+        names.sort()
+        words.sort()
+        return (
+            rows,
+            ([key for key, _ in names], [position for _, position in names]),
+            ([key for key, _ in words], [position for _, position in words]),
+        )
+
+
+def invalidate_ingredient_index(**kwargs):
+    """Меняет версию ингредиентов, чтобы все процессы перестроили индекс."""
+    bump_data_version('ingredients')
+
+
+ingredient_index = IngredientIndex()
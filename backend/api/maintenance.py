@@ -0,0 +1,49 @@
+from django.core.management import call_command
+from django.db.models import Q
+
+from core import base62
+
+from .cache_tags import invalidate_authors, invalidate_recipes
+from .feed import rebuild_feeds
+from .models import Recipe
+from .search import rebuild_search_index
+
+BATCH_SIZE = 5000
+
+
+def fill_short_links():
+    """
+    Выдает коды base62 от id рецептам без короткой ссылки: рецепты,
+    вставленные в обход Recipe.save(), получают их здесь.
+    """
+    missing = Recipe.objects.filter(
+        Q(short_link__isnull=True) | Q(short_link='')
+    )
+    filled = 0
+    while True:
+        recipes = [
+            Recipe(pk=pk, short_link=base62.encode(pk))
+            for pk in missing.order_by('pk').values_list(
+                'pk', flat=True
+            )[:BATCH_SIZE]
+        ]
+        if not recipes:
+            return filled
+        Recipe.objects.bulk_update(recipes, ['short_link'])
+        filled += len(recipes)
+
+
+def refresh_recipe_data(stdout):
+    """
+    Приводит производные данные в соответствие с таблицами после вставки
+    в обход save() и сигналов: короткие ссылки, счетчики, поисковый
+    индекс, ленты подписок и кеш ответов.
+    """
+    fill_short_links()
+    call_command('repair_counters', stdout=stdout)
+    rebuild_search_index()
+    rebuild_feeds()
+    # Тег авторов есть у всех ответов рецептов, поэтому сбрасываются
+    # и страницы отдельных рецептов.
+    invalidate_recipes([])
+    invalidate_authors()
@@ -0,0 +1,222 @@
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import (FavoriteRecipe, Ingredient, Recipe,
+                        RecipeIngredient, UserRecipeShoppingCart)
+from users.models import Subscription
+
+CustomUser = get_user_model()
+
+
+def percentile(values, percent):
+    """Возвращает перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, round(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def consume(response):
+    """Дочитывает тело ответа, в том числе потокового."""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число SQL-запросов, задержку p50/p95 и пиковую память '
+        'для каждого эндпоинта API на текущей базе данных и сверяет '
+        'результаты с бюджетом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='число замеров на каждый эндпоинт'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='число прогревочных запросов перед замерами'
+        )
+        parser.add_argument(
+            '--user',
+            type=str,
+            default=None,
+            help='email пользователя, от имени которого идут запросы'
+        )
+        parser.add_argument(
+            '--ingredient-prefix',
+            type=str,
+            default='а',
+            help='префикс для запроса /api/ingredients/?name='
+        )
+        parser.add_argument(
+            '--budget',
+            type=str,
+            default=None,
+            help='путь к json-файлу с бюджетами вместо API_BENCHMARK_BUDGETS'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='путь для json-отчета, по умолчанию вывод в stdout'
+        )
+
+    def handle(self, *args, **kwargs):
+        user = self.get_user(kwargs['user'])
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        if recipe is None:
+            raise CommandError(
+                'В базе нет рецептов. Сначала наполните её данными.'
+            )
+        client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.force_authenticate(user)
+        anonymous_client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+        budgets = self.get_budgets(kwargs['budget'])
+        endpoints = self.get_endpoints(recipe, kwargs['ingredient_prefix'])
+        results = {}
+        for name, url in endpoints.items():
+            results[name] = self.measure(
+                client, url, kwargs['iterations'], kwargs['warmup']
+            )
+        # Анонимные ответы после прогрева отдаются из кеша ответов.
+        for name, url in self.get_anonymous_endpoints(recipe).items():
+            results[name] = self.measure(
+                anonymous_client, url, kwargs['iterations'], kwargs['warmup']
+            )
+
+        report = {
+            'database': connection.vendor,
+            'scale': self.get_scale(),
+            'iterations': kwargs['iterations'],
+            'endpoints': results,
+            'violations': self.check_budgets(results, budgets),
+        }
+        rendered = json.dumps(report, ensure_ascii=False, indent=2)
+        if kwargs['output']:
+            with open(kwargs['output'], 'w', encoding='utf-8') as file:
+                file.write(rendered)
+        else:
+            self.stdout.write(rendered)
+
+        if report['violations']:
+            raise CommandError(
+                'Превышен бюджет: ' + '; '.join(report['violations'])
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджеты соблюдены.'))
+
+    def get_user(self, email):
+        users = CustomUser.objects.order_by('id')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('Пользователь для замеров не найден.')
+        return user
+
+    def get_budgets(self, path):
+        if path is None:
+            return settings.API_BENCHMARK_BUDGETS
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise CommandError(f'{path} не найден.')
+
+    def get_endpoints(self, recipe, ingredient_prefix):
+        return {
+            'recipes-list': reverse('recipes-list'),
+            'recipes-detail': reverse(
+                'recipes-detail', kwargs={'pk': recipe.id}
+            ),
+            'recipes-feed': reverse('recipes-feed'),
+            'users-subscriptions': reverse('users-user_subscriptions'),
+            'users-list': reverse('users-list'),
+            'ingredients-search': (
+                f'{reverse("ingredients-list")}?name={ingredient_prefix}'
+            ),
+            'download-shopping-cart': reverse(
+                'recipes-download-shopping-cart'
+            ),
+            'short-link': reverse(
+                'short-link', kwargs={'short_link': recipe.short_link}
+            ),
+        }
+
+    def get_anonymous_endpoints(self, recipe):
+        return {
+            'anonymous-recipes-list': reverse('recipes-list'),
+            'anonymous-recipes-detail': reverse(
+                'recipes-detail', kwargs={'pk': recipe.id}
+            ),
+        }
+
+    def get_scale(self):
+        return {
+            'recipes': Recipe.objects.count(),
+            'recipe_ingredients': RecipeIngredient.objects.count(),
+            'ingredients': Ingredient.objects.count(),
+            'users': CustomUser.objects.count(),
+            'favorites': FavoriteRecipe.objects.count(),
+            'shopping_cart': UserRecipeShoppingCart.objects.count(),
+            'subscriptions': Subscription.objects.count(),
+        }
+
+    def measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            consume(client.get(url))
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            consume(response)
+        queries = len(context.captured_queries)
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            consume(client.get(url))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        consume(client.get(url))
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def check_budgets(self, results, budgets):
+        violations = []
+        metrics = (
+            ('max_queries', 'queries'),
+            ('max_p95_ms', 'p95_ms'),
+            ('max_peak_memory_kb', 'peak_memory_kb'),
+        )
+        for name, result in results.items():
+            budget = budgets.get(name, {})
+            for limit_key, metric in metrics:
+                limit = budget.get(limit_key)
+                if limit is not None and result[metric] > limit:
+                    violations.append(
+                        f'{name}: {metric}={result[metric]} > {limit}'
+                    )
+        return violations
@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Recipe
+from users.models import CustomUser
+
+OK_STATUSES = (200, 302)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность эндпоинтов чтения: синхронные '
+        'вью через WSGI против асинхронных (/api/async/) через ASGI при '
+        'большом числе одновременных запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='число запросов к каждому эндпоинту'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='число одновременных запросов к ASGI'
+        )
+        parser.add_argument(
+            '--wsgi-threads',
+            type=int,
+            default=1,
+            help=(
+                'число потоков WSGI; 1 — как один sync-воркер gunicorn '
+                'из entrypoint.sh'
+            )
+        )
+        parser.add_argument(
+            '--db-latency-ms',
+            type=float,
+            default=0,
+            help=(
+                'искусственная задержка каждого SQL-запроса, чтобы '
+                'смоделировать сетевую БД на локальной базе'
+            )
+        )
+        parser.add_argument(
+            '--user',
+            type=str,
+            default=None,
+            help='email пользователя, от имени которого идут запросы'
+        )
+
+    def handle(self, *args, **kwargs):
+        users = CustomUser.objects.order_by('id')
+        user = (
+            users.filter(email=kwargs['user']).first() if kwargs['user']
+            else users.first()
+        )
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        if user is None or recipe is None:
+            raise CommandError(
+                'В базе нет пользователей или рецептов. '
+                'Сначала наполните её данными.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        self.authorization = f'Token {token.key}'
+        if kwargs['db_latency_ms']:
+            self.add_db_latency(kwargs['db_latency_ms'] / 1000)
+
+        self.stdout.write(
+            f'Запросов: {kwargs["requests"]}, конкурентность ASGI: '
+            f'{kwargs["concurrency"]}, потоков WSGI: {kwargs["wsgi_threads"]}'
+        )
+        for name, (sync_url, async_url) in self.get_endpoints(recipe).items():
+            wsgi_rps = self.run_wsgi(
+                sync_url, kwargs['requests'], kwargs['wsgi_threads']
+            )
+            asgi_rps = asyncio.run(self.run_asgi(
+                async_url, kwargs['requests'], kwargs['concurrency']
+            ))
+            self.stdout.write(
+                f'{name}: WSGI {wsgi_rps:.0f} запр/с, '
+                f'ASGI {asgi_rps:.0f} запр/с, x{asgi_rps / wsgi_rps:.1f}'
+            )
+
+    def get_endpoints(self, recipe):
+        return {
+            'recipes-list': (
+                reverse('recipes-list'), reverse('async-recipes-list')
+            ),
+            'recipes-detail': (
+                reverse('recipes-detail', kwargs={'pk': recipe.id}),
+                reverse('async-recipes-detail', kwargs={'pk': recipe.id}),
+            ),
+            'tags': (reverse('tags-list'), reverse('async-tags-list')),
+            'ingredients': (
+                reverse('ingredients-list'),
+                reverse('async-ingredients-list'),
+            ),
+            'users-subscriptions': (
+                reverse('users-user_subscriptions'),
+                reverse('async-users-subscriptions'),
+            ),
+            'short-link': (
+                reverse('short-link', kwargs={
+                    'short_link': recipe.short_link
+                }),
+                reverse('async-short-link', kwargs={
+                    'short_link': recipe.short_link
+                }),
+            ),
+        }
+
+    def add_db_latency(self, latency):
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install(connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        connection_created.connect(install, weak=False)
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def check_response(self, response, url):
+        if response.status_code not in OK_STATUSES:
+            raise CommandError(f'{url}: статус {response.status_code}')
+
+    def run_wsgi(self, url, requests, threads):
+        local = threading.local()
+
+        def send(_):
+            if not hasattr(local, 'client'):
+                local.client = Client(
+                    HTTP_HOST=settings.ALLOWED_HOSTS[0],
+                    HTTP_AUTHORIZATION=self.authorization,
+                )
+            self.check_response(local.client.get(url), url)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(send, range(requests)))
+        return requests / (time.perf_counter() - start)
+
+    async def run_asgi(self, url, requests, concurrency):
+        client = AsyncClient()
+        headers = {'Authorization': self.authorization}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send():
+            async with semaphore:
+                self.check_response(
+                    await client.get(url, headers=headers), url
+                )
+
+        # AsyncClient всегда шлет заголовок Host: testserver.
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            start = time.perf_counter()
+            await asyncio.gather(*(send() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from core.metrics import MetricsMiddleware, record_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет накладные расходы сбора метрик (core.metrics) на один '
+        'запрос: MetricsMiddleware без вью и SQL и вызов record_cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=100000,
+            help='число замеров'
+        )
+        parser.add_argument(
+            '--budget-us',
+            type=float,
+            default=5,
+            help='допустимые накладные расходы на запрос, мкс'
+        )
+
+    def handle(self, *args, **kwargs):
+        iterations = kwargs['iterations']
+        metrics = {
+            **settings.METRICS, 'ENABLED': True, 'MULTIPROCESS_DIR': ''
+        }
+        with override_settings(METRICS=metrics):
+            request_us = self.measure_middleware(iterations)
+            cache_us = self.measure(
+                lambda: record_cache('benchmark', True), iterations
+            )
+        self.stdout.write(
+            f'MetricsMiddleware: {request_us:.2f} мкс на запрос, '
+            f'record_cache: {cache_us:.2f} мкс на вызов'
+        )
+        if request_us > kwargs['budget_us']:
+            raise CommandError(
+                f'Накладные расходы {request_us:.2f} мкс превышают '
+                f'бюджет {kwargs["budget_us"]} мкс.'
+            )
+
+    def measure_middleware(self, iterations):
+        path = reverse('recipes-list')
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        response = HttpResponse()
+
+        def view(request):
+            return response
+
+        def get_response(request):
+            # Как в BaseHandler: process_view вызывается внутри цепочки.
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = MetricsMiddleware(get_response)
+        baseline = self.measure(lambda: view(request), iterations)
+        return self.measure(lambda: middleware(request), iterations) - baseline
+
+    def measure(self, function, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - start) / iterations * 1e6
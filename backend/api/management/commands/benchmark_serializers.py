@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import FastRecipeSerializer
+from api.models import Recipe
+from api.serializers import RecipeSerializer
+from core.renderers import FastJSONRenderer
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает RecipeSerializer и FastRecipeSerializer на страницах '
+        'рецептов, уже загруженных через with_read_plan, и время '
+        'рендеринга JSONRenderer и FastJSONRenderer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=100,
+            help='число рецептов на странице'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='число повторов каждого замера'
+        )
+
+    def handle(self, *args, **kwargs):
+        user = CustomUser.objects.order_by('id').first()
+        recipes = list(
+            Recipe.objects.with_read_plan(user).with_user_flags(
+                user
+            ).order_by('-pub_date', '-id')[:kwargs['page_size']]
+        )
+        if not recipes:
+            raise CommandError(
+                'В базе нет рецептов. Сначала наполните её данными.'
+            )
+        repeat = kwargs['repeat']
+        results = {}
+        for name, serializer_class in (
+            ('RecipeSerializer', RecipeSerializer),
+            ('FastRecipeSerializer', FastRecipeSerializer),
+        ):
+            results[name] = self.measure(
+                lambda: serializer_class(recipes, many=True).data, repeat
+            )
+        data = RecipeSerializer(recipes, many=True).data
+        for name, renderer in (
+            ('JSONRenderer', JSONRenderer()),
+            ('FastJSONRenderer', FastJSONRenderer()),
+        ):
+            results[name] = self.measure(lambda: renderer.render(data), repeat)
+
+        for name, seconds in results.items():
+            self.stdout.write(
+                f'{name:<22} {seconds * 1000:8.2f} мс на страницу, '
+                f'{len(recipes) / seconds:10.0f} рецептов/с'
+            )
+        serialize = (
+            results['RecipeSerializer'] / results['FastRecipeSerializer']
+        )
+        render = results['JSONRenderer'] / results['FastJSONRenderer']
+        self.stdout.write(
+            f'Ускорение: сериализация в {serialize:.1f} раза, '
+            f'рендеринг в {render:.1f} раза'
+        )
+
+    def measure(self, function, repeat):
+        """Лучшее время одного вызова из repeat повторов."""
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        return best
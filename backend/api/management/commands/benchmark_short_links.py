@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from api.models import Recipe
+from api.short_links import LEGACY_LINK_LENGTH, resolve_short_link
+
+
+def resolve_from_database(code):
+    """Прежний способ: поиск рецепта по short_link в БД на каждый запрос."""
+    return get_object_or_404(Recipe, short_link=code).id
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает число редиректов по коротким ссылкам в секунду: '
+        'поиск в БД на каждый запрос против base62-кодов и LRU-кеша.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--links',
+            type=int,
+            default=1000,
+            help='число коротких ссылок в выборке'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='сколько раз пройти по выборке'
+        )
+
+    def handle(self, *args, **kwargs):
+        links = list(
+            Recipe.objects.exclude(short_link=None).values_list(
+                'short_link', flat=True
+            )[:kwargs['links']]
+        )
+        if not links:
+            raise CommandError('В базе нет рецептов с короткими ссылками.')
+        legacy = sum(len(code) == LEGACY_LINK_LENGTH for code in links)
+        self.stdout.write(
+            f'Ссылок: {len(links)}, из них старого формата: {legacy}'
+        )
+
+        before = self.measure(resolve_from_database, links, kwargs['rounds'])
+        after = self.measure(resolve_short_link, links, kwargs['rounds'])
+        self.stdout.write(f'Поиск в БД: {before:.0f} редиректов/с')
+        self.stdout.write(f'Base62 и LRU: {after:.0f} редиректов/с')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: x{after / before:.1f}'
+        ))
+
+    def measure(self, resolve, links, rounds):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for code in links:
+                reverse('recipes-detail', kwargs={'pk': resolve(code)})
+        return rounds * len(links) / (time.perf_counter() - start)
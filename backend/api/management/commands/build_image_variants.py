@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.signals import IMAGE_FIELDS
+from core.images import update_variants, variants_field
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит уменьшенные копии (IMAGE_VARIANTS) для уже загруженных '
+        'изображений рецептов и аватаров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='перестроить копии и для изображений, где они уже есть'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(settings.IMAGE_VARIANTS['WORKERS'], 1),
+            help='число потоков обработки'
+        )
+
+    def handle(self, *args, **kwargs):
+        errors = 0
+        for model, field_name in IMAGE_FIELDS.items():
+            # Один файл бывает у многих объектов: обрабатываем его один раз.
+            names = {
+                name
+                for name, variants in model.objects.exclude(
+                    **{f'{field_name}__isnull': True}
+                ).exclude(**{field_name: ''}).values_list(
+                    field_name, variants_field(field_name)
+                ).iterator()
+                if kwargs['force'] or variants.get('source') != name
+            }
+            with ThreadPoolExecutor(max_workers=kwargs['workers']) as pool:
+                done = sum(pool.map(
+                    lambda name: self.build(model, field_name, name), names
+                ))
+            errors += len(names) - done
+            self.stdout.write(
+                f'{model._meta.label}.{field_name}: '
+                f'обработано файлов {done} из {len(names)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, с ошибками: {errors}'
+        ))
+
+    def build(self, model, field_name, name):
+        try:
+            update_variants(model, field_name, name)
+            return True
+        except Exception as error:
+            self.stdout.write(self.style.ERROR(f'{name}: {error}'))
+            return False
+        finally:
+            connections.close_all()
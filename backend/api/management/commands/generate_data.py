@@ -0,0 +1,292 @@
+import csv
+import io
+import itertools
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.ingredient_index import invalidate_ingredient_index
+from api.maintenance import refresh_recipe_data
+from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                        Tag, UserRecipeShoppingCart)
+from core import base62
+from users.models import Subscription
+
+CustomUser = get_user_model()
+
+PLACEHOLDER_IMAGE = 'recipes/images/generated.png'
+
+MAX_SAMPLE_ROUNDS = 10
+
+
+class ZipfSampler:
+    """Выборка элементов с вероятностью, обратной степени их ранга."""
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        self.item_set = set(self.items)
+        self.rng = rng
+        self.rng.shuffle(self.items)
+        total = 0.0
+        self.cum_weights = []
+        for rank in range(1, len(self.items) + 1):
+            total += 1 / rank ** exponent
+            self.cum_weights.append(total)
+
+    def sample(self, count, exclude=None):
+        """Возвращает до count различных элементов, кроме exclude."""
+        count = min(count, len(self.items) - (exclude in self.item_set))
+        result = set()
+        for _ in range(MAX_SAMPLE_ROUNDS):
+            result.update(
+                item for item in self.rng.choices(
+                    self.items, cum_weights=self.cum_weights, k=count
+                ) if item != exclude
+            )
+            if len(result) >= count:
+                return list(result)[:count]
+        # Хвост распределения почти не выпадает: добираем самые частые.
+        for item in self.items:
+            if len(result) >= count:
+                break
+            if item != exclude:
+                result.add(item)
+        return list(result)[:count]
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетические данные для нагрузочного тестирования: '
+        'пользователей, рецепты, теги, избранное, корзины и подписки '
+        'с распределением Ципфа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='число пользователей'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='число рецептов'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=10,
+            help='число тегов (существующие переиспользуются)'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='минимальное число ингредиентов в базе'
+        )
+        parser.add_argument(
+            '--favorites-per-user', type=int, default=20,
+            help='среднее число избранных рецептов у пользователя'
+        )
+        parser.add_argument(
+            '--cart-per-user', type=int, default=5,
+            help='среднее число рецептов в корзине пользователя'
+        )
+        parser.add_argument(
+            '--subscriptions-per-user', type=int, default=10,
+            help='среднее число подписок у пользователя'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='показатель распределения Ципфа'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='зерно генератора случайных чисел'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='размер пачки при вставке'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['users'] < 1 or kwargs['recipes'] < 1:
+            raise CommandError(
+                'Нужен хотя бы один пользователь и один рецепт.'
+            )
+        self.rng = random.Random(kwargs['seed'])
+        self.batch_size = kwargs['batch_size']
+        self.use_copy = connection.vendor == 'postgresql'
+        zipf = kwargs['zipf']
+
+        tag_ids = self.ensure_tags(kwargs['tags'])
+        ingredient_ids = self.ensure_ingredients(kwargs['ingredients'])
+        user_ids = self.create_users(kwargs['users'])
+        recipe_ids = self.create_recipes(
+            kwargs['recipes'], ZipfSampler(user_ids, zipf, self.rng)
+        )
+        self.create_recipe_relations(
+            recipe_ids,
+            ZipfSampler(tag_ids, zipf, self.rng),
+            ZipfSampler(ingredient_ids, zipf, self.rng),
+        )
+        recipes = ZipfSampler(recipe_ids, zipf, self.rng)
+        self.create_user_links(
+            FavoriteRecipe, ('user', 'recipe'), user_ids, recipes,
+            kwargs['favorites_per_user'],
+        )
+        self.create_user_links(
+            UserRecipeShoppingCart, ('user', 'recipe'), user_ids, recipes,
+            kwargs['cart_per_user'],
+        )
+        self.create_user_links(
+            Subscription, ('subscribers', 'subscriptions', 'created_at'),
+            user_ids, ZipfSampler(user_ids, zipf, self.rng),
+            kwargs['subscriptions_per_user'], exclude_self=True,
+            extra=(timezone.now(),),
+        )
+        if self.use_copy:
+            self.reset_sequences()
+        refresh_recipe_data(self.stdout)
+        self.stdout.write(self.style.SUCCESS('Генерация завершена.'))
+
+    def next_ids(self, model, count):
+        max_id = model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        return range(max_id + 1, max_id + 1 + count)
+
+    def ensure_tags(self, count):
+        existing = Tag.objects.count()
+        Tag.objects.bulk_create(
+            Tag(name=f'tag-{number}', slug=f'tag-{number}')
+            for number in range(existing, count)
+        )
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def ensure_ingredients(self, count):
+        ids = self.next_ids(Ingredient, count - Ingredient.objects.count())
+        self.insert(
+            Ingredient, ('id', 'name', 'measurement_unit'),
+            ((pk, f'ингредиент {pk}', self.rng.choice(('г', 'мл', 'шт')))
+             for pk in ids),
+        )
+        invalidate_ingredient_index()
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        ids = self.next_ids(CustomUser, count)
+        password = make_password('password')
+        now = timezone.now()
+        self.insert(
+            CustomUser,
+            ('id', 'email', 'username', 'first_name', 'last_name',
+             'password', 'is_superuser', 'is_staff', 'is_active',
+             'date_joined', 'recipes_count', 'subscribers_count',
+             'avatar_variants'),
+            ((pk, f'user{pk}@example.com', f'user{pk}', 'Имя', 'Фамилия',
+              password, False, False, True, now, 0, 0, {}) for pk in ids),
+        )
+        return list(ids)
+
+    def create_recipes(self, count, authors):
+        ids = self.next_ids(Recipe, count)
+        now = timezone.now()
+        # pub_date учитывается только при COPY: bulk_create подставляет
+        # текущее время для полей с auto_now_add. У колонок счетчиков в БД
+        # нет значения по умолчанию, их заполнит repair_counters. Карта
+        # копий изображения тоже обязательна.
+        self.insert(
+            Recipe,
+            ('id', 'author', 'name', 'text', 'image', 'cooking_time',
+             'pub_date', 'short_link', 'favorites_count', 'cart_count',
+             'image_variants'),
+            ((pk, authors.sample(1)[0], f'Рецепт {pk}', 'Описание рецепта.',
+              PLACEHOLDER_IMAGE, self.rng.randint(1, 240),
+              now - timedelta(minutes=count - number), base62.encode(pk),
+              0, 0, {})
+             for number, pk in enumerate(ids)),
+        )
+        return list(ids)
+
+    def create_recipe_relations(self, recipe_ids, tags, ingredients):
+        self.insert(
+            Recipe.tags.through, ('recipe', 'tag'),
+            ((recipe_id, tag_id) for recipe_id in recipe_ids
+             for tag_id in tags.sample(self.rng.randint(1, 3))),
+        )
+        self.insert(
+            RecipeIngredient, ('recipe', 'ingredient', 'amount'),
+            ((recipe_id, ingredient_id, self.rng.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient_id in ingredients.sample(self.rng.randint(3, 20))),
+        )
+
+    def create_user_links(self, model, fields, user_ids, targets, average,
+                          exclude_self=False, extra=()):
+        def sample(user_id):
+            return targets.sample(
+                self.rng.randint(0, 2 * average),
+                exclude=user_id if exclude_self else None,
+            )
+
+        self.insert(
+            model, fields,
+            ((user_id, target, *extra) for user_id in user_ids
+             for target in sample(user_id)),
+        )
+
+    def insert(self, model, fields, rows):
+        """Вставляет строки пачками через COPY или bulk_create."""
+        model_fields = [model._meta.get_field(name) for name in fields]
+        total = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                if self.use_copy:
+                    self.copy(model, model_fields, batch)
+                else:
+                    model.objects.bulk_create(
+                        model(**{
+                            field.attname: value
+                            for field, value in zip(model_fields, row)
+                        })
+                        for row in batch
+                    )
+            total += len(batch)
+        self.stdout.write(f'{model._meta.db_table}: {total} строк создано')
+
+    def copy(self, model, model_fields, batch):
+        buffer = io.StringIO()
+        # Значения JSONField передаются в COPY как текст JSON.
+        csv.writer(buffer).writerows(
+            [
+                json.dumps(value) if isinstance(value, (dict, list))
+                else value
+                for value in row
+            ]
+            for row in batch
+        )
+        buffer.seek(0)
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in model_fields
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+                f'({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+
+    def reset_sequences(self):
+        models = (
+            Ingredient, CustomUser, Recipe, Recipe.tags.through,
+            RecipeIngredient, FavoriteRecipe, UserRecipeShoppingCart,
+            Subscription,
+        )
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                self.style, models
+            ):
+                cursor.execute(sql)
@@ -1,53 +1,310 @@
 import csv
+import itertools
+import json
+from pathlib import Path
 
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from api.maintenance import refresh_recipe_data
+from api.models import (FavoriteRecipe, Recipe, RecipeIngredient,
+                        UserRecipeShoppingCart)
+from api.signals import VERSIONED_MODELS
+from core.versioning import bump_data_version
+from users.models import CustomUser, Subscription
+
+MAX_REPORTED_ERRORS = 20
+
+# bulk_create не вызывает save() и сигналы, поэтому после загрузки этих
+# моделей производные данные рецептов пересчитываются целиком.
+RECIPE_DATA_MODELS = {
+    Recipe,
+    Recipe.tags.through,
+    RecipeIngredient,
+    FavoriteRecipe,
+    UserRecipeShoppingCart,
+    Subscription,
+    CustomUser,
+}
 
 
 class Command(BaseCommand):
-    help = 'Команда для создания списка объектов из .csv файла'
+    help = (
+        'Команда для массовой загрузки объектов из .csv, .json или .jsonl '
+        'файла с обновлением уже существующих записей.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
-            'csv_file',
+            'data_file',
             type=str,
-            help='путь к csv файлу'
+            help='путь к csv, json или jsonl файлу'
         )
         parser.add_argument(
             'model_to_load',
             type=str,
             help='модель для создания объектов.'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='число строк в одной транзакции'
+        )
+        parser.add_argument(
+            '--unique-fields',
+            type=str,
+            default=None,
+            help=(
+                'поля через запятую, по которым ищутся существующие записи; '
+                'по умолчанию — первый уникальный ключ модели без '
+                'полей с null=True'
+            )
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='только проверить данные, ничего не записывая'
+        )
 
     def handle(self, *args, **kwargs):
-        csv_file = kwargs['csv_file']
-        model_name = kwargs['model_to_load']
-
+        data_file = Path(kwargs['data_file'])
         try:
-            app_label, model_name = model_name.split(".")
+            app_label, model_name = kwargs['model_to_load'].split('.')
             Model = apps.get_model(app_label, model_name)
-        except LookupError:
-            self.stdout.write(
-                self.style.ERROR(f'Модель "{model_name}" не найдена.')
+        except (LookupError, ValueError):
+            raise CommandError(
+                f'Модель "{kwargs["model_to_load"]}" не найдена.'
             )
-            return
+        if not data_file.exists():
+            raise CommandError(f'{data_file} не найден.')
+
+        self.Model = Model
+        self.fields = {
+            name: field
+            for field in Model._meta.concrete_fields
+            if not field.primary_key
+            for name in (field.name, field.attname)
+        }
+        self.unique_fields = self.get_unique_fields(kwargs['unique_fields'])
+        # Конфликт по другим уникальным ключам не обновляет запись, а
+        # ломает вставку, поэтому такие строки отсеиваются заранее.
+        self.other_unique_keys = [
+            key for key in self.get_unique_keys()
+            if set(key) != set(self.unique_fields)
+        ]
+        # Существование связанных объектов проверяет ограничение БД, а не
+        # clean_fields, который сделал бы запрос на каждую строку.
+        self.skip_validation = [
+            field.name for field in Model._meta.concrete_fields
+            if field.is_relation
+        ]
+        self.errors = 0
+
+        loaded = 0
+        rows = self.read_rows(data_file)
+        while True:
+            batch = list(itertools.islice(rows, kwargs['batch_size']))
+            if not batch:
+                break
+            valid_rows = self.exclude_conflicts(self.validate(batch, loaded))
+            if not kwargs['dry_run']:
+                self.save(valid_rows, {
+                    self.fields[name].name
+                    for data in batch for name in data
+                    if name in self.fields
+                })
+            loaded += len(batch)
+            self.stdout.write(f'Обработано строк: {loaded}')
 
-        model_fields = [
-            field.name for field in Model._meta.fields if field.name != 'id'
+        if not kwargs['dry_run'] and Model in VERSIONED_MODELS:
+            bump_data_version(VERSIONED_MODELS[Model])
+        if not kwargs['dry_run'] and Model in RECIPE_DATA_MODELS:
+            refresh_recipe_data(self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {loaded} строк, с ошибками: {self.errors}'
+            + (' (dry-run, ничего не записано)' if kwargs['dry_run'] else '')
+        ))
+
+    def get_unique_fields(self, unique_fields):
+        if unique_fields:
+            names = unique_fields.split(',')
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise CommandError(f'Неизвестные поля: {", ".join(unknown)}')
+            return [self.fields[name].name for name in names]
+        # NULL не равен NULL, поэтому ключ с полем null=True не годится
+        # для поиска существующих записей.
+        for key in self.get_unique_keys():
+            if not any(self.fields[name].null for name in key):
+                return list(key)
+        return []
+
+    def get_unique_keys(self):
+        """Уникальные ключи модели: поля, unique_together, UniqueConstraint."""
+        meta = self.Model._meta
+        keys = [
+            (field.name,) for field in meta.concrete_fields
+            if field.unique and not field.primary_key
         ]
+        keys.extend(tuple(fields) for fields in meta.unique_together)
+        keys.extend(
+            tuple(constraint.fields)
+            for constraint in meta.total_unique_constraints
+        )
+        return keys
+
+    def read_rows(self, data_file):
+        """Построчно читает файл и отдает словари поле -> значение."""
+        if data_file.suffix == '.jsonl':
+            with open(data_file, encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+        elif data_file.suffix == '.json':
+            with open(data_file, encoding='utf-8') as file:
+                yield from json.load(file)
+        else:
+            yield from self.read_csv(data_file)
+
+    def read_csv(self, data_file):
+        with open(data_file, newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            first_row = next(reader, None)
+            if first_row is None:
+                return
+            if all(name in self.fields for name in first_row):
+                header = first_row
+            else:
+                # Файл без заголовка: колонки идут в порядке полей модели.
+                header = [
+                    field.attname for field in self.Model._meta.concrete_fields
+                    if not field.primary_key
+                ]
+                yield dict(zip(header, first_row))
+            for row in reader:
+                yield dict(zip(header, row))
+
+    def validate(self, batch, offset):
+        """
+        Проверяет валидаторы полей без обращения к БД и убирает повторы
+        уникальных ключей внутри пачки: остается последняя запись.
+        Строки с NULL в ключе не сливаются.
+
+        Возвращает словарь: ключ -> (номер строки, данные, объект).
+        """
+        rows = {}
+        for number, data in enumerate(batch, start=offset + 1):
+            try:
+                obj = self.Model(**{
+                    self.fields[name].attname: self.to_value(name, value)
+                    for name, value in data.items()
+                })
+                obj.clean_fields(exclude=self.skip_validation)
+                key = self.key_value(obj, self.unique_fields)
+            except (KeyError, TypeError, ValueError, ValidationError) as error:
+                self.report_error(number, data, error)
+                continue
+            rows[key if key is not None else ('row', number)] = (
+                number, data, obj
+            )
+        return rows
+
+    def to_value(self, name, value):
+        # В CSV нет NULL: пустая строка в поле с null=True — это NULL.
+        if value == '' and self.fields[name].null:
+            return None
+        return value
 
+    def key_value(self, obj, names):
+        """Значения полей ключа или None, если ключа нет или в нем NULL."""
+        # to_python приводит строки из CSV к типу поля (id связей не
+        # проходят clean_fields), чтобы сравнивать их со значениями из БД.
+        value = tuple(
+            self.fields[name].to_python(
+                getattr(obj, self.fields[name].attname)
+            )
+            for name in names
+        )
+        if not value or None in value:
+            return None
+        return value
+
+    def exclude_conflicts(self, rows):
+        """
+        Убирает строки, которые по другому уникальному ключу совпадают
+        с записью в БД или строкой пачки, но не по ключу поиска: такую
+        строку нельзя ни вставить, ни обновить.
+        """
+        target = [self.fields[name].attname for name in self.unique_fields]
+        for names in self.other_unique_keys:
+            attnames = [self.fields[name].attname for name in names]
+            values = {
+                self.key_value(obj, names) for _, _, obj in rows.values()
+            } - {None}
+            if not values:
+                continue
+            lookup = Q()
+            for value in values:
+                lookup |= Q(**dict(zip(attnames, value)))
+            # Значение ключа -> какой записи оно принадлежит.
+            owners = {}
+            for existing in self.Model.objects.filter(lookup).values_list(
+                *attnames, *target, 'pk'
+            ):
+                owner = existing[len(attnames):-1] or ('pk', existing[-1])
+                owners[existing[:len(attnames)]] = owner
+            kept = {}
+            for key, (number, data, obj) in rows.items():
+                value = self.key_value(obj, names)
+                if value is not None and owners.setdefault(value, key) != key:
+                    self.report_error(
+                        number, data,
+                        f'значение ({", ".join(names)}) уже занято '
+                        'другой записью'
+                    )
+                    continue
+                kept[key] = (number, data, obj)
+            rows = kept
+        return rows
+
+    def save(self, rows, present_fields):
+        objects = [obj for _, _, obj in rows.values()]
+        if not objects:
+            return
         try:
-            with open(csv_file, newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    data = {}
-                    for element_index, value in enumerate(row):
-                        if element_index < len(model_fields):
-                            data[model_fields[element_index]] = value
-                    obj, created = Model.objects.get_or_create(**data)
-                    if created:
-                        self.stdout.write(f'Объект: {data} создан')
-                    else:
-                        self.stdout.write(f'Объект: {data} не был создан')
-        except FileNotFoundError:
-            self.stdout.write(f'{csv_file} не найден.')
+            with transaction.atomic():
+                if not self.unique_fields:
+                    self.Model.objects.bulk_create(objects)
+                    return
+                update_fields = sorted(
+                    present_fields - set(self.unique_fields)
+                )
+                self.Model.objects.bulk_create(
+                    objects,
+                    update_conflicts=bool(update_fields),
+                    ignore_conflicts=not update_fields,
+                    unique_fields=(
+                        self.unique_fields if update_fields else None
+                    ),
+                    update_fields=update_fields or None,
+                )
+        except IntegrityError as error:
+            # Например, ссылка на несуществующий объект: пачка не записана.
+            numbers = [number for number, _, _ in rows.values()]
+            self.errors += len(numbers) - 1
+            self.report_error(
+                f'{min(numbers)}–{max(numbers)}',
+                f'пачка из {len(numbers)} строк не записана',
+                error,
+            )
+
+    def report_error(self, number, data, error):
+        self.errors += 1
+        if self.errors <= MAX_REPORTED_ERRORS:
+            self.stdout.write(
+                self.style.ERROR(f'Строка {number}: {data} — {error}')
+            )
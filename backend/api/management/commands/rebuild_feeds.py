@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает ленты подписок всех пользователей по текущим '
+        'подпискам и рецептам.'
+    )
+
+    def handle(self, *args, **kwargs):
+        rebuilt = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перестроено лент: {rebuilt}.'
+        ))
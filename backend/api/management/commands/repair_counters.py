@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from api.counters import COUNTERS, actual_count
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики рецептов и пользователей '
+        'пачками и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='число объектов в одной пачке'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='только показать число расхождений'
+        )
+
+    def handle(self, *args, **kwargs):
+        for model, field, source, foreign_key in COUNTERS:
+            repaired = 0
+            last_pk = 0
+            while True:
+                batch = list(
+                    model.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', flat=True)[:kwargs['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1]
+                drifted = list(
+                    model.objects.filter(pk__in=batch).annotate(
+                        actual=actual_count(source, foreign_key)
+                    ).exclude(**{field: F('actual')}).values_list(
+                        'pk', flat=True
+                    )
+                )
+                if drifted and not kwargs['dry_run']:
+                    # Пересчет в самом UPDATE не затирает изменения,
+                    # сделанные между чтением и записью.
+                    model.objects.filter(pk__in=drifted).update(
+                        **{field: actual_count(source, foreign_key)}
+                    )
+                repaired += len(drifted)
+            self.stdout.write(
+                f'{model._meta.label}.{field}: расхождений {repaired}'
+            )
+        self.stdout.write(self.style.SUCCESS('Готово.'))
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.lru import LRUCache
+from core.metrics import record_cache
+from core.versioning import bump_data_version, get_data_version
+
+from .models import FavoriteRecipe, UserRecipeShoppingCart
+
+MEMBERSHIP_MODELS = {
+    'favorites': FavoriteRecipe,
+    'cart': UserRecipeShoppingCart,
+}
+
+
+class LocalMembershipBackend:
+    """Хранит множества id рецептов в LRU-кеше процесса."""
+
+    def __init__(self, max_users, ttl):
+        self._cache = LRUCache(max_users, ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, recipe_ids):
+        self._cache.set(key, recipe_ids)
+
+
+class SharedMembershipBackend:
+    """Хранит множества id рецептов в общем кеше Django."""
+
+    def __init__(self, max_users, ttl):
+        self.ttl = ttl
+
+    def get(self, key):
+        return cache.get(key)
+
+    def set(self, key, recipe_ids):
+        cache.set(key, recipe_ids, self.ttl)
+
+
+MEMBERSHIP_BACKENDS = {
+    'local': LocalMembershipBackend,
+    'shared': SharedMembershipBackend,
+}
+
+
+class MembershipCache:
+    """
+    Кеш id рецептов в избранном и корзине каждого пользователя.
+
+    Множество загружается из БД при первом обращении и хранится под
+    ключом с версией пользователя из core.versioning. После изменения
+    избранного или корзины версия меняется, когда транзакция
+    зафиксирована. Множество в кеше никогда не переписывается, поэтому
+    одновременные изменения не теряются. Множество, которое загрузили
+    до коммита, остается под старой версией и больше не читается.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def recipe_ids(self, user, kind):
+        key = self._key(user, kind)
+        recipe_ids = self.backend.get(key)
+        record_cache('membership', recipe_ids is not None)
+        if recipe_ids is None:
+            recipe_ids = frozenset(
+                MEMBERSHIP_MODELS[kind].objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)
+            )
+            self.backend.set(key, recipe_ids)
+        return recipe_ids
+
+    def contains(self, user, kind, recipe_id):
+        return recipe_id in self.recipe_ids(user, kind)
+
+    def invalidate(self, user, kind):
+        """Сбрасывает кеш после коммита текущей транзакции."""
+        name = self._version_name(user, kind)
+        transaction.on_commit(lambda: bump_data_version(name))
+
+    def _key(self, user, kind):
+        version = get_data_version(self._version_name(user, kind))
+        return f'membership:{kind}:{user.pk}:{version}'
+
+    def _version_name(self, user, kind):
+        return f'membership:{kind}:{user.pk}'
+
+
+membership = MembershipCache(
+    MEMBERSHIP_BACKENDS[settings.MEMBERSHIP_CACHE['BACKEND']](
+        settings.MEMBERSHIP_CACHE['MAX_USERS'],
+        settings.MEMBERSHIP_CACHE['TTL'],
+    )
+)
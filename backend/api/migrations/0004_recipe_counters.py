@@ -0,0 +1,52 @@
+# Generated by Django 4.2.24 on 2026-10-18 09:56
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(source, foreign_key):
+    counted = source.objects.filter(
+        **{foreign_key: OuterRef('pk')}
+    ).order_by().values(foreign_key).annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    FavoriteRecipe = apps.get_model('api', 'FavoriteRecipe')
+    UserRecipeShoppingCart = apps.get_model('api', 'UserRecipeShoppingCart')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Subscription = apps.get_model('users', 'Subscription')
+    Recipe.objects.update(
+        favorites_count=count_of(FavoriteRecipe, 'recipe'),
+        cart_count=count_of(UserRecipeShoppingCart, 'recipe'),
+    )
+    CustomUser.objects.update(
+        recipes_count=count_of(Recipe, 'author'),
+        subscribers_count=count_of(Subscription, 'subscriptions'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_auto_20250129_1453'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='в корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='в избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
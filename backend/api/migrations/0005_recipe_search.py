@@ -0,0 +1,57 @@
+# Generated by Django 4.2.24 on 2026-10-18 09:58
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    На PostgreSQL заполняет search_vector и строит по нему GIN-индекс,
+    на SQLite создает теневую таблицу FTS5.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE api_recipe SET search_vector = "
+            "setweight(to_tsvector('russian', COALESCE(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', COALESCE(text, '')), 'B')"
+        )
+        schema_editor.execute(
+            'CREATE INDEX api_recipe_search_vector_gin '
+            'ON api_recipe USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE api_recipe_fts '
+            'USING fts5(name, text, tokenize="unicode61")'
+        )
+        schema_editor.execute(
+            'INSERT INTO api_recipe_fts (rowid, name, text) '
+            'SELECT id, name, text FROM api_recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS api_recipe_search_vector_gin'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS api_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
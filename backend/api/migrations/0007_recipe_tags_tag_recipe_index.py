@@ -0,0 +1,22 @@
+# Generated by Django 4.2.24 on 2026-10-18 11:00
+
+from django.db import migrations
+
+# Связующая таблица тегов создается Django автоматически, поэтому индекс
+# (tag_id, recipe_id) задается SQL: выборка рецептов по тегу идет
+# только по индексу, без чтения таблицы.
+INDEX_NAME = 'api_recipe_tags_tag_recipe_idx'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX {INDEX_NAME} ON api_recipe_tags (tag_id, recipe_id)',
+            f'DROP INDEX IF EXISTS {INDEX_NAME}',
+        ),
+    ]
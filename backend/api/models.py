@@ -1,11 +1,13 @@
-import uuid
-
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.utils.text import slugify
 
+from core import base62
+
 CustomUser = get_user_model()
 
 
@@ -60,6 +62,58 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет рецептов с пользовательскими флагами."""
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует рецепты флагами user_favorited и user_in_cart
+        коррелированными подзапросами EXISTS для переданного пользователя.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                user_favorited=Value(False),
+                user_in_cart=Value(False),
+            )
+        return self.annotate(
+            user_favorited=Exists(
+                FavoriteRecipe.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk'),
+                )
+            ),
+            user_in_cart=Exists(
+                UserRecipeShoppingCart.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk'),
+                )
+            ),
+        )
+
+    def with_read_plan(self, user):
+        """
+        Подгружает связанные объекты, которые читает RecipeSerializer,
+        за фиксированное число запросов независимо от размера страницы
+        и числа ингредиентов.
+        """
+        return self.prefetch_related(
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+            Prefetch(
+                'tags',
+                queryset=Tag.objects.only('id', 'name', 'slug'),
+            ),
+            Prefetch(
+                'author',
+                queryset=CustomUser.objects.with_subscription_flag(user),
+            ),
+        )
+
+
 class Recipe(models.Model):
     """МОдель рецептов."""
 
@@ -85,6 +139,12 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/images/'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='уменьшенные копии изображения',
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=[
             MinValueValidator(settings.POSITIVE_SMALL_INTEGER_MIN),
@@ -121,19 +181,44 @@ class Recipe(models.Model):
         null=True,
         verbose_name='короткая ссылка',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='в избранном',
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='в корзинах',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            # Последние рецепты автора: заполнение и чтение ленты подписок.
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.short_link:
-            self.short_link = uuid.uuid4().hex[:9]
         super().save(*args, **kwargs)
+        if not self.short_link:
+            # Код base62 от id уникален и декодируется без обращения к БД.
+            self.short_link = base62.encode(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_link=self.short_link
+            )
 
 
 class RecipeIngredient(models.Model):
@@ -234,3 +319,55 @@ class UserRecipeShoppingCart(models.Model):
             f'Рецепт: {self.recipe.name} в корзине пользователя '
             f'{self.user.username}: '
         )
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Дата публикации копируется из рецепта, чтобы страница
+    ленты читалась по одному индексу (user, pub_date, recipe).
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='читатель ленты'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='рецепт'
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор рецепта'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self) -> str:
+        return (
+            f'Рецепт {self.recipe.name} в ленте пользователя '
+            f'{self.user.username}'
+        )
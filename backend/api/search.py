@@ -0,0 +1,96 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe
+
+FTS_TABLE = 'api_recipe_fts'
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def recipe_search_vector():
+    """Взвешенный вектор: совпадения в названии важнее, чем в описании."""
+    return (
+        SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=settings.SEARCH_CONFIG)
+    )
+
+
+def index_recipe(recipe):
+    """Обновляет поисковый индекс одного рецепта."""
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk=recipe.pk).update(
+            search_vector=recipe_search_vector()
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                [recipe.pk, recipe.name, recipe.text],
+            )
+
+
+def unindex_recipe(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+
+
+def rebuild_search_index():
+    """Перестраивает поисковый индекс всех рецептов одним запросом."""
+    if connection.vendor == 'postgresql':
+        Recipe.objects.update(search_vector=recipe_search_vector())
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'SELECT id, name, text FROM api_recipe'
+            )
+
+
+def search_recipes(queryset, value):
+    """
+    Оставляет рецепты, подходящие под запрос, и сортирует их
+    по релевантности, затем по дате публикации.
+    """
+    words = WORD_PATTERN.findall(value)
+    if not words:
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+    else:
+        # Каждое слово — префикс, все слова обязательны.
+        match = ' '.join(f'"{word}"*' for word in words)
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'AND {FTS_TABLE}.rowid = api_recipe.id',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
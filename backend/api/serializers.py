@@ -1,11 +1,16 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from core.timing import TimedListSerializer, TimedSerializerMixin
 from users.serializers import CustomUserSerializer
-from users.utils import Base64ImageField
+from users.utils import Base64ImageField, ImageVariantsField
 
-from .utils import create_recipeingredients
+from .utils import create_recipeingredients, sync_recipeingredients
 from .base_serializers import BaseRecipeSerializer
+from .cache_tags import invalidate_recipes
+from .membership import membership
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient, Tag,
                      UserRecipeShoppingCart)
 
@@ -55,7 +60,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         return obj.ingredient.measurement_unit
 
 
-class RecipeSerializer(BaseRecipeSerializer):
+class RecipeSerializer(TimedSerializerMixin, BaseRecipeSerializer):
     """Сериализатор рецептов."""
 
     author = CustomUserSerializer(read_only=True)
@@ -86,6 +91,7 @@ class RecipeSerializer(BaseRecipeSerializer):
             'is_favorited',
             'is_in_shopping_cart',
         ]
+        list_serializer_class = TimedListSerializer
 
     def to_representation(self, instance):
         recipe_representation = super().to_representation(instance)
@@ -97,41 +103,60 @@ class RecipeSerializer(BaseRecipeSerializer):
         return recipe_representation
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'user_favorited'):
+            return obj.user_favorited
+        if 'favorited_ids' in self.context:
+            return obj.id in self.context['favorited_ids']
         user = self.context['request'].user
         if user.is_authenticated:
-            return obj.is_favorited.filter(id=user.id).exists()
+            return obj.favorites.filter(user=user).exists()
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'user_in_cart'):
+            return obj.user_in_cart
+        if 'cart_ids' in self.context:
+            return obj.id in self.context['cart_ids']
         user = self.context['request'].user
         if user.is_authenticated:
-            return obj in user.recipes_in_cart.all()
+            return obj.in_cart.filter(user=user).exists()
         return False
 
     def create(self, validated_data):
         user = self.context['request'].user
         ingredients_data = validated_data.pop('recipe_ingredients', None)
         tags_data = validated_data.pop('tags', None)
-        recipe = Recipe.objects.create(
-            **validated_data,
-        )
-        recipe.tags.set(tags_data)
-        create_recipeingredients(recipe, ingredients_data)
-        recipe.is_favorited.add(user)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                **validated_data,
+                favorites_count=1,
+            )
+            recipe.tags.set(tags_data)
+            create_recipeingredients(recipe, ingredients_data)
+            recipe.is_favorited.add(user)
+        membership.invalidate(user, 'favorites')
         return recipe
 
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients', None)
         tags_data = validated_data.pop('tags', None)
-        if tags_data:
-            instance.tags.set(tags_data)
-        if ingredients_data:
-            instance.ingredients.clear()
-            create_recipeingredients(instance, ingredients_data)
-
-        for field, value in validated_data.items():
-            setattr(instance, field, value)
-        instance.save()
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        with transaction.atomic():
+            if tags_data:
+                # set() сам сравнивает с текущими тегами и меняет
+                # только разницу.
+                instance.tags.set(tags_data)
+            if ingredients_data:
+                sync_recipeingredients(instance, ingredients_data)
+            for field in changed_fields:
+                setattr(instance, field, validated_data[field])
+            if changed_fields:
+                instance.save(update_fields=changed_fields)
+        # Ингредиенты меняются пакетно, без post_save.
+        invalidate_recipes([instance.id])
         return instance
 
     def validate(self, attrs):
@@ -160,19 +185,37 @@ class RecipeSerializer(BaseRecipeSerializer):
 class FavoriteOrShoppingSerializer(serializers.ModelSerializer):
     """Сериализатор ответа для: избранных рецептов и корзины покупок."""
 
+    image_srcset = ImageVariantsField(source='image_variants')
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_srcset',
             'cooking_time',
         )
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для пакетных операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализатор избранных рецептов."""
 
+    membership_kind = 'favorites'
+
     class Meta:
         model = FavoriteRecipe
         fields = (
@@ -197,6 +240,8 @@ class FavoriteSerializer(serializers.ModelSerializer):
 class ShoppingSerializer(FavoriteSerializer):
     """Сериализатор корзины покупок."""
 
+    membership_kind = 'cart'
+
     class Meta(FavoriteSerializer.Meta):
         model = UserRecipeShoppingCart
         validators = [
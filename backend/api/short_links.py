@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core import base62
+from core.lru import LRUCache
+from core.metrics import record_cache
+
+from .models import Recipe
+
+# Старые ссылки — 9 символов из uuid4().hex; base62-коды id короче,
+# поэтому по длине их не спутать.
+LEGACY_LINK_LENGTH = 9
+
+# Записи живут SHORT_LINK_CACHE_TTL секунд: рецепт, удаленный через другой
+# процесс, перестает открываться по ссылке не позже этого срока.
+known_links = LRUCache(
+    settings.SHORT_LINK_CACHE_SIZE, settings.SHORT_LINK_CACHE_TTL
+)
+
+
+def _shared_key(code):
+    return f'short-link:{code}'
+
+
+def resolve_short_link(code):
+    """
+    Возвращает id рецепта по короткой ссылке или None.
+
+    Коды base62 декодируются в id, существование рецепта проверяется
+    по LRU процесса и при промахе — запросом по первичному ключу. Старые
+    ссылки ищутся в LRU процесса, затем в общем кеше и только потом в БД.
+    """
+    if len(code) > LEGACY_LINK_LENGTH:
+        return None
+    recipe_id = known_links.get(code)
+    if recipe_id is not None:
+        record_cache('short-links', True)
+        return recipe_id
+    if len(code) < LEGACY_LINK_LENGTH:
+        record_cache('short-links', False)
+        recipe_id = base62.decode(code)
+        if recipe_id is None or not Recipe.objects.filter(
+            pk=recipe_id
+        ).exists():
+            return None
+        known_links.set(code, recipe_id)
+        return recipe_id
+    if settings.SHORT_LINK_SHARED_CACHE:
+        recipe_id = cache.get(_shared_key(code))
+    record_cache('short-links', recipe_id is not None)
+    if recipe_id is None:
+        recipe_id = Recipe.objects.filter(
+            short_link=code
+        ).values_list('id', flat=True).first()
+        if recipe_id is None:
+            return None
+    remember_short_link(code, recipe_id)
+    return recipe_id
+
+
+def remember_short_link(code, recipe_id):
+    known_links.set(code, recipe_id)
+    if len(code) == LEGACY_LINK_LENGTH and settings.SHORT_LINK_SHARED_CACHE:
+        cache.set(_shared_key(code), recipe_id, None)
+
+
+def forget_short_link(code):
+    known_links.delete(code)
+    if settings.SHORT_LINK_SHARED_CACHE:
+        cache.delete(_shared_key(code))
@@ -0,0 +1,148 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core import base62
+from core.images import refresh_image_variants, variants_updated
+from core.versioning import bump_data_version
+from users.models import CustomUser, Subscription
+
+from .cache_tags import invalidate_authors, invalidate_recipes
+from .counters import update_counters
+from .feed import follow, publish_recipe, unfollow
+from .ingredient_index import invalidate_ingredient_index
+from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                     Tag, UserRecipeShoppingCart)
+from .search import index_recipe, unindex_recipe
+from .short_links import forget_short_link, remember_short_link
+
+# Модели, версия данных которых хранится в core.versioning.
+VERSIONED_MODELS = {
+    Ingredient: 'ingredients',
+    Tag: 'tags',
+}
+
+# Поля изображений, для которых строятся уменьшенные копии.
+IMAGE_FIELDS = {
+    Recipe: 'image',
+    CustomUser: 'avatar',
+}
+
+# Поля рецепта, от которых зависит поисковый индекс.
+SEARCH_FIELDS = {'name', 'text'}
+
+# Поля пользователя, которые показываются в рецептах как данные автора.
+AUTHOR_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants',
+}
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_ingredient_index()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_data_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        index_recipe(instance)
+    if instance.short_link:
+        remember_short_link(instance.short_link, instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        publish_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    unindex_recipe(instance.pk)
+    # Код base62 открывает рецепт и при старой ссылке в short_link.
+    forget_short_link(base62.encode(instance.pk))
+    if instance.short_link:
+        forget_short_link(instance.short_link)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=CustomUser)
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    refresh_image_variants(instance, IMAGE_FIELDS[sender], update_fields)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # После очистки у тега уже не узнать, какие рецепты затронуты.
+        invalidate_recipes(instance.recipes.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            invalidate_recipes([instance.pk])
+        elif pk_set:
+            invalidate_recipes(pk_set)
+
+
+@receiver(post_save, sender=CustomUser)
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Регистрация и вход (last_login) не меняют данных авторов рецептов.
+    if created:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    if Recipe.objects.filter(author=instance).exists():
+        invalidate_authors()
+
+
+@receiver(variants_updated, sender=Recipe)
+def recipe_variants_updated(sender, queryset, **kwargs):
+    invalidate_recipes(queryset.values_list('pk', flat=True).iterator())
+
+
+@receiver(variants_updated, sender=CustomUser)
+def avatar_variants_updated(sender, queryset, **kwargs):
+    if Recipe.objects.filter(author__in=queryset).exists():
+        invalidate_authors()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=UserRecipeShoppingCart)
+@receiver(post_save, sender=Subscription)
+def counted_row_created(sender, instance, created, **kwargs):
+    if created:
+        update_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=UserRecipeShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def counted_row_deleted(sender, instance, origin=None, **kwargs):
+    update_counters(sender, instance, -1, origin)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        follow(instance.subscribers_id, instance.subscriptions)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    unfollow(instance.subscribers_id, instance.subscriptions_id)
@@ -0,0 +1,33 @@
+import threading
+
+from core.versioning import get_data_version
+
+from .models import Tag
+
+
+class TagSlugMap:
+    """
+    Словарь slug -> id тегов в памяти процесса.
+
+    Тегов немного, поэтому словарь строится целиком одним запросом и
+    перестраивается, когда меняется версия 'tags' в общем кеше.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._mapping = None
+
+    def get_mapping(self):
+        version = get_data_version('tags')
+        mapping = self._mapping
+        if mapping is not None and version == self._version:
+            return mapping
+        with self._lock:
+            if self._mapping is None or version != self._version:
+                self._mapping = dict(Tag.objects.values_list('slug', 'id'))
+                self._version = version
+            return self._mapping
+
+
+tag_slug_map = TagSlugMap()
@@ -0,0 +1,488 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.pdf import StreamingPDF, get_font
+from core.renderers import FastJSONRenderer
+from core.versioning import get_data_versions
+from users.models import CustomUser, Subscription
+
+from .cache_tags import RECIPES_TAG, recipe_tag
+from .counters import COUNTERS, actual_count
+from .fast_serializers import FastRecipeSerializer
+from .membership import membership
+from .models import FeedEntry, Ingredient, Recipe, RecipeIngredient, Tag
+from .serializers import RecipeSerializer
+from .short_links import known_links
+
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    for alias in ('default', 'responses')
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeTestCase(TestCase):
+    """Читатель, три автора и 12 рецептов с тегами и ингредиентами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='reader@example.com', password='password',
+            username='reader', first_name='Имя', last_name='Фамилия',
+        )
+        authors = [
+            CustomUser.objects.create_user(
+                email=f'author{number}@example.com', password='password',
+                username=f'author{number}', first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=f'тег {number}', slug=f'tag-{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(20)
+        ]
+        recipes = []
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                text='Описание рецепта.',
+                image='recipes/images/test.png',
+                cooking_time=10,
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            # Первый рецепт — с 20 ингредиентами, остальные — с тремя.
+            count = len(ingredients) if number == 0 else 3
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[:count]
+            )
+            recipes.append(recipe)
+        cls.big_recipe = recipes[0]
+        cls.small_recipe = recipes[1]
+        cls.user.favorites.create(recipe=cls.small_recipe)
+        cls.user.in_cart.create(recipe=cls.big_recipe)
+        Subscription.objects.create(
+            subscriptions=authors[0], subscribers=cls.user
+        )
+
+        # Копии изображений и символы, которые JSONRenderer экранирует.
+        cls.small_recipe.text = 'Строка\u2028абзац\u2029 и "кавычки" </script>'
+        cls.small_recipe.image_variants = {
+            'source': 'recipes/images/test.png',
+            'srcset': {'webp': {'160': 'derivatives/ab/ab/160.webp'}},
+        }
+        cls.small_recipe.save(update_fields=['text', 'image_variants'])
+        authors[0].avatar = 'users/avatar/test.png'
+        authors[0].avatar_variants = {
+            'source': 'users/avatar/test.png',
+            'srcset': {'avif': {'160': 'derivatives/cd/cd/160.avif'}},
+        }
+        authors[0].save(update_fields=['avatar', 'avatar_variants'])
+
+
+class RecipeQueryCountTests(RecipeTestCase):
+    """
+    Число SQL-запросов списка и страницы рецепта не зависит от размера
+    страницы и числа ингредиентов.
+    """
+
+    # Кеши очищаются перед каждым замером, поэтому число запросов
+    # включает загрузку избранного и корзины пользователя.
+    LIST_QUERIES = {'anonymous': 5, 'authenticated': 7}
+    DETAIL_QUERIES = {'anonymous': 4, 'authenticated': 6}
+
+    def get_client(self, kind):
+        client = APIClient()
+        if kind == 'authenticated':
+            client.force_authenticate(self.user)
+        return client
+
+    def assert_queries(self, client, url, expected):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        with self.assertNumQueries(expected):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for kind, expected in self.LIST_QUERIES.items():
+            client = self.get_client(kind)
+            for limit in (3, 10):
+                with self.subTest(kind=kind, limit=limit):
+                    response = self.assert_queries(
+                        client,
+                        f'{reverse("recipes-list")}?limit={limit}',
+                        expected,
+                    )
+                    self.assertEqual(len(response.json()['results']), limit)
+
+    def test_detail_queries_do_not_depend_on_ingredients(self):
+        for kind, expected in self.DETAIL_QUERIES.items():
+            client = self.get_client(kind)
+            for recipe, ingredients in (
+                (self.small_recipe, 3), (self.big_recipe, 20)
+            ):
+                with self.subTest(kind=kind, ingredients=ingredients):
+                    response = self.assert_queries(
+                        client,
+                        reverse('recipes-detail', kwargs={'pk': recipe.pk}),
+                        expected,
+                    )
+                    self.assertEqual(
+                        len(response.json()['ingredients']), ingredients
+                    )
+
+
+class FastRecipeSerializerTests(RecipeTestCase):
+    """
+    FastRecipeSerializer с FastJSONRenderer дают те же байты, что
+    RecipeSerializer с JSONRenderer.
+    """
+
+    def get_context(self, user, source):
+        request = Request(APIRequestFactory().get(reverse('recipes-list')))
+        request.user = user
+        context = {'request': request}
+        if source == 'membership' and user.is_authenticated:
+            context['favorited_ids'] = membership.recipe_ids(
+                user, 'favorites'
+            )
+            context['cart_ids'] = membership.recipe_ids(user, 'cart')
+        return context
+
+    def get_recipes(self, user, source):
+        queryset = Recipe.objects.with_read_plan(user).order_by(
+            '-pub_date', '-id'
+        )
+        if source == 'annotations':
+            queryset = queryset.with_user_flags(user)
+        return list(queryset)
+
+    def assert_same_output(self, instance, context, many):
+        expected = JSONRenderer().render(
+            RecipeSerializer(instance, many=many, context=context).data
+        )
+        actual = FastJSONRenderer().render(
+            FastRecipeSerializer(instance, many=many, context=context).data
+        )
+        self.assertEqual(actual, expected)
+
+    def test_serializer_output_matches(self):
+        # membership — id из кеша, annotations — флаги with_user_flags,
+        # queries — без них, с запросом на каждый рецепт.
+        for user in (AnonymousUser(), self.user):
+            for source in ('membership', 'annotations', 'queries'):
+                with self.subTest(
+                    user=user.is_authenticated, source=source
+                ):
+                    context = self.get_context(user, source)
+                    recipes = self.get_recipes(user, source)
+                    self.assert_same_output(recipes, context, many=True)
+                    for recipe in recipes:
+                        self.assert_same_output(recipe, context, many=False)
+
+    def test_api_responses_match(self):
+        urls = [
+            f'{reverse("recipes-list")}?limit=5&page={page}'
+            for page in (1, 2, 3)
+        ] + [
+            reverse('recipes-detail', kwargs={'pk': recipe.pk})
+            for recipe in (self.small_recipe, self.big_recipe)
+        ]
+        for kind in ('anonymous', 'authenticated'):
+            client = APIClient()
+            if kind == 'authenticated':
+                client.force_authenticate(self.user)
+            for url in urls:
+                with self.subTest(kind=kind, url=url):
+                    caches['responses'].clear()
+                    with override_settings(FAST_READ_SERIALIZERS=False):
+                        expected = client.get(url)
+                    caches['responses'].clear()
+                    with override_settings(FAST_READ_SERIALIZERS=True):
+                        actual = client.get(url)
+                    self.assertEqual(actual.status_code, expected.status_code)
+                    self.assertEqual(actual.content, expected.content)
+
+
+class ShortLinkTests(RecipeTestCase):
+    """Короткие ссылки ведут только на существующие рецепты."""
+
+    def setUp(self):
+        known_links.clear()
+
+    def get_link(self, code):
+        return self.client.get(reverse('short-link', kwargs={
+            'short_link': code
+        }))
+
+    def test_existing_recipe_redirects(self):
+        recipe = Recipe.objects.get(pk=self.small_recipe.pk)
+        response = self.get_link(recipe.short_link)
+        self.assertRedirects(
+            response,
+            reverse('recipes-detail', kwargs={'pk': recipe.pk}),
+            fetch_redirect_response=False,
+        )
+
+    def test_unknown_code_returns_404(self):
+        self.assertEqual(self.get_link('zzzzzzz').status_code, 404)
+
+    def test_deleted_recipe_returns_404(self):
+        recipe = Recipe.objects.get(pk=self.small_recipe.pk)
+        self.assertEqual(self.get_link(recipe.short_link).status_code, 302)
+        recipe.delete()
+        self.assertEqual(self.get_link(recipe.short_link).status_code, 404)
+
+
+class CounterTests(RecipeTestCase):
+    """Счетчики совпадают с фактическим числом строк на всех путях."""
+
+    def assert_counters(self):
+        for model, field, source, foreign_key in COUNTERS:
+            with self.subTest(field=field):
+                self.assertFalse(
+                    model.objects.annotate(
+                        actual=actual_count(source, foreign_key)
+                    ).exclude(**{field: F('actual')}).exists()
+                )
+
+    def test_api_paths(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True)[:5])
+        for name in ('favorite', 'shopping_cart'):
+            url = reverse(f'recipes-{name}', kwargs={'pk': recipe_ids[2]})
+            self.assertEqual(client.post(url).status_code, 201)
+            self.assertEqual(client.post(url).status_code, 400)
+            self.assert_counters()
+            self.assertEqual(client.delete(url).status_code, 204)
+            self.assertEqual(client.delete(url).status_code, 400)
+            self.assert_counters()
+            bulk_url = reverse(f'recipes-{name}_bulk')
+            data = {'recipes': recipe_ids}
+            client.post(bulk_url, data, format='json')
+            self.assert_counters()
+            client.delete(bulk_url, data, format='json')
+            self.assert_counters()
+        client.post(
+            reverse('recipes-shopping_cart_bulk'),
+            {'recipes': recipe_ids},
+            format='json',
+        )
+        client.delete(reverse('recipes-shopping_cart_clear'))
+        self.assert_counters()
+
+        author = self.big_recipe.author
+        url = reverse('users-manage-subscription', kwargs={'id': author.pk})
+        self.assertEqual(client.delete(url).status_code, 204)
+        self.assert_counters()
+        self.assertEqual(client.post(url).status_code, 201)
+        self.assert_counters()
+
+        client.force_authenticate(author)
+        response = client.delete(
+            reverse('recipes-detail', kwargs={'pk': self.big_recipe.pk})
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_counters()
+
+    def test_cascade_deletes(self):
+        Recipe.objects.get(pk=self.small_recipe.pk).delete()
+        self.assert_counters()
+        # Автор с подписчиком и рецептами в избранном и корзине читателя.
+        CustomUser.objects.filter(pk=self.big_recipe.author_id).delete()
+        self.assert_counters()
+        CustomUser.objects.get(pk=self.user.pk).delete()
+        self.assert_counters()
+
+
+@override_settings(FEED={'MAX_ENTRIES': 500, 'FAN_OUT_LIMIT': 1})
+class FeedTests(RecipeTestCase):
+    """Рецепты автора попадают в ленты при смене fan-out и fan-in."""
+
+    def feed_recipe_ids(self, user):
+        return set(
+            FeedEntry.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            )
+        )
+
+    def test_fanned_in_recipes_are_backfilled(self):
+        author = self.big_recipe.author
+        follower = CustomUser.objects.create_user(
+            email='follower@example.com', password='password',
+            username='follower', first_name='Имя', last_name='Фамилия',
+        )
+        subscription = Subscription.objects.create(
+            subscriptions=author, subscribers=follower
+        )
+        # Объект автора загружен до подписки и хранит старый счетчик.
+        recipe = Recipe.objects.create(
+            author=author,
+            name='Новый рецепт',
+            text='Описание рецепта.',
+            image='recipes/images/test.png',
+            cooking_time=10,
+        )
+        self.assertNotIn(recipe.pk, self.feed_recipe_ids(self.user))
+
+        subscription.delete()
+        self.assertIn(recipe.pk, self.feed_recipe_ids(self.user))
+        self.assertEqual(
+            self.feed_recipe_ids(self.user),
+            set(Recipe.objects.filter(author=author).values_list(
+                'pk', flat=True
+            )),
+        )
+
+
+class ShoppingListTests(RecipeTestCase):
+    """Список покупок во всех форматах."""
+
+    def download(self, file_format):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(
+            reverse('recipes-download-shopping-cart'),
+            {'file_format': file_format},
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_text_formats(self):
+        txt = self.download('txt').decode()
+        self.assertEqual(len(txt.splitlines()), 20)
+        self.assertIn('ингредиент 0 (г) - 1\n', txt)
+        csv_lines = self.download('csv').decode().splitlines()
+        self.assertEqual(csv_lines[1], 'ингредиент 0,г,1')
+
+    def test_pdf(self):
+        pdf = self.download('pdf')
+        self.assertTrue(pdf.startswith(b'%PDF-1.4\n'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        self.assertIn(b'/FontFile2', pdf)
+        # Смещение таблицы xref указывает на её начало.
+        offset = int(pdf.rsplit(b'startxref\n', 1)[1].split()[0])
+        self.assertEqual(pdf[offset:offset + 4], b'xref')
+
+    def test_aborted_pdf_releases_font_state(self):
+        document = StreamingPDF()
+        chunks = document.stream(f'строка {number}' for number in range(200))
+        next(chunks)
+        next(chunks)
+        self.assertIn(document, get_font().state)
+        # Клиент прервал загрузку: сервер закрывает генератор.
+        chunks.close()
+        self.assertNotIn(document, get_font().state)
+
+
+class LoadDataTests(RecipeTestCase):
+    """Рецепты, загруженные load_data, видны так же, как созданные в API."""
+
+    def test_loaded_recipe(self):
+        author = self.big_recipe.author
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = Path(directory) / 'recipes.jsonl'
+            data_file.write_text(json.dumps({
+                'author_id': author.pk,
+                'name': 'Загруженный пирог',
+                'text': 'Описание рецепта.',
+                'image': 'recipes/images/test.png',
+                'cooking_time': 30,
+            }) + '\n', encoding='utf-8')
+            call_command(
+                'load_data', str(data_file), 'api.Recipe', stdout=io.StringIO()
+            )
+        recipe = Recipe.objects.get(name='Загруженный пирог')
+        self.assertIsNotNone(recipe.short_link)
+        response = self.client.get(
+            reverse('short-link', kwargs={'short_link': recipe.short_link})
+        )
+        self.assertRedirects(
+            response,
+            reverse('recipes-detail', kwargs={'pk': recipe.pk}),
+            fetch_redirect_response=False,
+        )
+        author.refresh_from_db()
+        self.assertEqual(author.recipes_count, author.recipes.count())
+        response = self.client.get(
+            reverse('recipes-list'), {'search': 'пирог'}
+        )
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']], [recipe.pk]
+        )
+
+
+class SearchCursorTests(RecipeTestCase):
+    """Страницы поиска по курсору идут в порядке релевантности."""
+
+    def test_relevance_order_across_cursor_pages(self):
+        # Самые релевантные рецепты — самые старые.
+        for number in range(5):
+            Recipe.objects.create(
+                author=self.big_recipe.author,
+                name=f'Суп {number}',
+                text=' '.join(['борщ'] * (5 - number) + ['вода'] * 20),
+                image='recipes/images/test.png',
+                cooking_time=10,
+            )
+        url = reverse('recipes-list')
+        expected = [
+            item['id'] for item in self.client.get(
+                url, {'search': 'борщ', 'limit': 10}
+            ).json()['results']
+        ]
+        first = self.client.get(
+            url, {'search': 'борщ', 'limit': 3, 'cursor': ''}
+        ).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [item['id'] for item in first['results'] + second['results']],
+            expected,
+        )
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(expected, sorted(expected))
+        previous = self.client.get(second['previous']).json()
+        self.assertEqual(previous['results'], first['results'])
+
+
+class ResponseCacheInvalidationTests(RecipeTestCase):
+    """Версии тегов кеша ответов меняются только после фиксации."""
+
+    def test_versions_bumped_on_commit(self):
+        recipe = Recipe.objects.get(pk=self.small_recipe.pk)
+        tags = (RECIPES_TAG, recipe_tag(recipe.pk))
+        before = get_data_versions(tags)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                recipe.name = 'Новое название'
+                recipe.save(update_fields=['name'])
+                self.assertEqual(get_data_versions(tags), before)
+        after = get_data_versions(tags)
+        for tag in tags:
+            self.assertNotEqual(after[tag], before[tag])
@@ -3,6 +3,9 @@ from rest_framework.routers import DefaultRouter
 
 from users.views import CustomUserViewSet
 
+from .async_views import (AsyncIngredientListView, AsyncRecipeDetailView,
+                          AsyncRecipeListView, AsyncRecipeRedirectView,
+                          AsyncSubscriptionsView, AsyncTagListView)
 from .views import IngredientsViewSet, RecipeViewSet, TagViewSet
 
 api_v1 = DefaultRouter()
@@ -11,8 +14,37 @@ api_v1.register(r'tags', TagViewSet, basename='tags')
 api_v1.register(r'ingredients', IngredientsViewSet, basename='ingredients')
 api_v1.register(r'recipes', RecipeViewSet, basename='recipes')
 
+# Асинхронные версии эндпоинтов чтения для ASGI-сервера.
+async_urlpatterns = [
+    path(
+        'recipes/', AsyncRecipeListView.as_view(), name='async-recipes-list'
+    ),
+    path(
+        'recipes/<int:pk>/',
+        AsyncRecipeDetailView.as_view(),
+        name='async-recipes-detail',
+    ),
+    path('tags/', AsyncTagListView.as_view(), name='async-tags-list'),
+    path(
+        'ingredients/',
+        AsyncIngredientListView.as_view(),
+        name='async-ingredients-list',
+    ),
+    path(
+        'users/subscriptions/',
+        AsyncSubscriptionsView.as_view(),
+        name='async-users-subscriptions',
+    ),
+    path(
+        's/<str:short_link>/',
+        AsyncRecipeRedirectView.as_view(),
+        name='async-short-link',
+    ),
+]
+
 urlpatterns = [
     path('', include(api_v1.urls)),
+    path('async/', include(async_urlpatterns)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
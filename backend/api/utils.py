@@ -1,16 +1,26 @@
-from collections import defaultdict
+import csv
 
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.http import StreamingHttpResponse
 from rest_framework import response, status
 
-from .models import Recipe, RecipeIngredient
+from core.counters import counted_in_bulk, lock_row
+from core.pdf import StreamingPDF
+from users.models import CustomUser
+
+from .counters import MEMBERSHIP_COUNTERS
+from .membership import MEMBERSHIP_MODELS, membership
+from .models import (FavoriteRecipe, Recipe, RecipeIngredient,
+                     UserRecipeShoppingCart)
 
 
 def check_and_add(request, object, serializer_class):
     """
     Фунция выполняет проверки через переданный сериализатор,
     сохраняет объект и возвращает объект сериализатора.
+    Счетчик рецепта увеличивает сигнал вставки строки.
     """
     user = request.user
     serializer = serializer_class(
@@ -20,8 +30,11 @@ def check_and_add(request, object, serializer_class):
         },
         context={'request': request}
     )
-    serializer.is_valid(raise_exception=True)
-    serializer.save()
+    with transaction.atomic():
+        lock_row(CustomUser, user.pk)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    membership.invalidate(user, serializer_class.membership_kind)
     return response.Response(
         serializer.data,
         status=status.HTTP_201_CREATED
@@ -30,35 +43,175 @@ def check_and_add(request, object, serializer_class):
 
 def check_and_delete_from_favorite(request, object):
     """
-    Фунция выполняет проверку на существование связующей записи
-    модели FavoriteRecipe и удаляет его.
+    Фунция удаляет связующую запись модели FavoriteRecipe одним DELETE
+    и по числу удаленных строк проверяет, что она существовала.
+    Счетчик рецепта уменьшает сигнал удаления строки.
     """
     user = request.user
-    if not user.favorited.filter(id=object.id).exists():
+    with transaction.atomic():
+        lock_row(CustomUser, user.pk)
+        deleted, _ = FavoriteRecipe.objects.filter(
+            user=user, recipe=object
+        ).delete()
+    if not deleted:
         return response.Response(
             {'detail': 'Рецепт отсутствует в избранном.'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    user.favorited.remove(object)
+    membership.invalidate(user, 'favorites')
     return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
 def check_and_delete_from_cart(request, object):
     """
-    Фунция выполняет проверку на существование связующей записи
-    модели UserRecipeShoppingCart и удаляет его.
+    Фунция удаляет связующую запись модели UserRecipeShoppingCart одним
+    DELETE и по числу удаленных строк проверяет, что она существовала.
+    Счетчик рецепта уменьшает сигнал удаления строки.
     """
     user = request.user
-    if not user.recipes_in_cart.filter(id=object.id).exists():
+    with transaction.atomic():
+        lock_row(CustomUser, user.pk)
+        deleted, _ = UserRecipeShoppingCart.objects.filter(
+            user=user, recipe=object
+        ).delete()
+    if not deleted:
         return response.Response(
             {'detail': 'Рецепт отсутствует в корзине.'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    user.recipes_in_cart.remove(object)
+    membership.invalidate(user, 'cart')
     return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
+# Результаты пакетного изменения избранного или корзины по каждому id.
+BULK_RESULTS = {
+    True: ('added', 'already_added'),
+    False: ('removed', 'not_present'),
+}
+BULK_NOT_FOUND = 'not_found'
+
+
+def bulk_change_membership(user, kind, recipe_ids, add):
+    """
+    Добавляет рецепты recipe_ids в избранное или корзину (kind) либо
+    удаляет их оттуда и возвращает словарь id -> результат.
+
+    Под блокировкой строки пользователя существование рецептов и их
+    текущее состояние проверяются одним запросом, изменение — одним
+    INSERT или DELETE и одним UPDATE счетчиков ровно тех рецептов,
+    строки которых вставлены или удалены.
+    """
+    model = MEMBERSHIP_MODELS[kind]
+    counter = MEMBERSHIP_COUNTERS[kind]
+    with transaction.atomic(), counted_in_bulk():
+        lock_row(CustomUser, user.pk)
+        state = dict(
+            Recipe.objects.filter(id__in=recipe_ids).annotate(
+                member=Exists(
+                    model.objects.filter(user=user, recipe=OuterRef('pk'))
+                )
+            ).values_list('id', 'member')
+        )
+        changed = [
+            recipe_id for recipe_id, member in state.items()
+            if member != add
+        ]
+        recipes = Recipe.objects.filter(id__in=changed)
+        if changed and add:
+            # Блокировку берут не все, кто пишет (например, админка):
+            # чужая строка не должна превращать запрос в ошибку 500.
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=recipe_id)
+                 for recipe_id in changed],
+                ignore_conflicts=True,
+            )
+            recipes.update(**{counter: F(counter) + 1})
+        elif changed:
+            model.objects.filter(
+                user=user, recipe_id__in=changed
+            ).delete()
+            recipes.filter(**{f'{counter}__gte': 1}).update(
+                **{counter: F(counter) - 1}
+            )
+    if changed:
+        membership.invalidate(user, kind)
+
+    done, unchanged = BULK_RESULTS[add]
+    return {
+        recipe_id: (
+            BULK_NOT_FOUND if recipe_id not in state
+            else unchanged if state[recipe_id] == add
+            else done
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+def clear_membership(user, kind):
+    """
+    Очищает избранное или корзину пользователя под блокировкой его
+    строки: один UPDATE счетчиков рецептов и один DELETE.
+    """
+    model = MEMBERSHIP_MODELS[kind]
+    counter = MEMBERSHIP_COUNTERS[kind]
+    with transaction.atomic(), counted_in_bulk():
+        lock_row(CustomUser, user.pk)
+        Recipe.objects.filter(
+            id__in=model.objects.filter(user=user).values('recipe_id'),
+            **{f'{counter}__gte': 1},
+        ).update(**{counter: F(counter) - 1})
+        model.objects.filter(user=user).delete()
+    membership.invalidate(user, kind)
+
+
+class Echo:
+    """Псевдобуфер: csv.writer пишет в него, а строка сразу возвращается."""
+
+    def write(self, value):
+        return value
+
+
+def render_shopping_list_txt(rows):
+    for row in rows:
+        yield (
+            f'{row["ingredient__name"]} '
+            f'({row["ingredient__measurement_unit"]}) - '
+            f'{row["total_amount"]}\n'
+        )
+
+
+def render_shopping_list_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('ингредиент', 'ед. измерения', 'количество'))
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['total_amount'],
+        ))
+
+
+def render_shopping_list_pdf(rows):
+    return StreamingPDF().stream(
+        f'{row["ingredient__name"]} '
+        f'({row["ingredient__measurement_unit"]}) - {row["total_amount"]}'
+        for row in rows
+    )
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_shopping_list_txt),
+    'csv': ('text/csv; charset=utf-8', render_shopping_list_csv),
+    'pdf': ('application/pdf', render_shopping_list_pdf),
+}
+
+
 def get_shopping_list(request):
+    """
+    Отдает список покупок потоком: количество ингредиентов из рецептов
+    в корзине суммируется одним GROUP BY, а строки файла формируются
+    по мере чтения результата из БД.
+    """
     user = request.user
 
     if not user.is_authenticated:
@@ -66,30 +219,31 @@ def get_shopping_list(request):
             {'detail': 'Войдите в систему'},
             status=status.HTTP_401_UNAUTHORIZED
         )
-    queryset = Recipe.objects.filter(author=user)
+    file_format = request.query_params.get('file_format', 'txt')
+    if file_format not in SHOPPING_LIST_FORMATS:
+        return response.Response(
+            {'detail': 'Доступные форматы: '
+             + ', '.join(SHOPPING_LIST_FORMATS)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    content_type, render = SHOPPING_LIST_FORMATS[file_format]
 
-    shopping_dict = defaultdict(lambda: [0, ""])
-    recipe_ingredients_queryset = RecipeIngredient.objects.filter(
-        recipe__in=queryset
+    rows = RecipeIngredient.objects.filter(
+        recipe__in_cart__user=user
     ).values(
         'ingredient__name',
         'ingredient__measurement_unit'
-    ).annotate(total_amount=Sum('amount'))
-
-    for item in recipe_ingredients_queryset:
-        ingredient_name = item['ingredient__name']
-        measurement_unit = item['ingredient__measurement_unit']
-        amount = item['total_amount']
-        shopping_dict[ingredient_name][0] += amount
-        shopping_dict[ingredient_name][1] = measurement_unit
-
-    shopping_list = ""
-    for ingredient, (amount, measurement_unit) in shopping_dict.items():
-        shopping_list += f'{ingredient} ({measurement_unit}) - {amount}\n'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name').iterator(
+        chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+    )
 
-    shopping_file = HttpResponse(shopping_list, content_type='text/plain')
+    shopping_file = StreamingHttpResponse(
+        render(rows), content_type=content_type
+    )
     shopping_file['Content-Disposition'] = (
-        'attachment; filename="shopping_cart.txt"'
+        f'attachment; filename="shopping_cart.{file_format}"'
     )
     return shopping_file
 
@@ -105,3 +259,44 @@ def create_recipeingredients(object, ingredients_data):
             )
         )
     RecipeIngredient.objects.bulk_create(recipe_ingredient_list)
+
+
+def sync_recipeingredients(recipe, ingredients_data):
+    """
+    Приводит ингредиенты рецепта к ingredients_data минимумом изменений:
+    неизменные строки не трогает, новые количества пишет bulk_update,
+    удаляет и вставляет только лишние и недостающие строки.
+    """
+    wanted = {
+        ingredient_unit['id'].id: ingredient_unit['amount']
+        for ingredient_unit in ingredients_data
+    }
+    existing = {
+        row.ingredient_id: row
+        for row in recipe.recipe_ingredients.only(
+            'id', 'ingredient_id', 'amount'
+        )
+    }
+    removed = [
+        row.id for ingredient_id, row in existing.items()
+        if ingredient_id not in wanted
+    ]
+    changed = []
+    for ingredient_id, row in existing.items():
+        amount = wanted.get(ingredient_id)
+        if amount is not None and row.amount != amount:
+            row.amount = amount
+            changed.append(row)
+    added = [
+        RecipeIngredient(
+            recipe=recipe, ingredient_id=ingredient_id, amount=amount
+        )
+        for ingredient_id, amount in wanted.items()
+        if ingredient_id not in existing
+    ]
+    if removed:
+        RecipeIngredient.objects.filter(id__in=removed).delete()
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+    if added:
+        RecipeIngredient.objects.bulk_create(added)
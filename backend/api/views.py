@@ -1,56 +1,121 @@
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from rest_framework import exceptions, response, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
-from .filters import RecipeFilter, IngredientFilter
-from .models import Ingredient, Recipe, Tag
+from core.mixins import StreamingUploadMixin, VersionedSnapshotListMixin
+from core.pagination import KeysetLimitPagination
+from core.response_cache import AnonymousResponseCacheMixin
+from core.timing import TimedViewMixin
 from core.permissions import (
     AuthenticatedOrReadOnlyRequest,
     IsAuthorAdminOrReadOnlyObject
 )
+
+from .cache_tags import AUTHORS_TAG, RECIPES_TAG, recipe_tag
+from .fast_serializers import FastRecipeSerializer
+from .feed import FeedPagination
+from .filters import IngredientFilter, RecipeFilter
+from .ingredient_index import ingredient_index
+from .membership import membership
+from .models import Ingredient, Recipe, Tag
 from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingSerializer, TagSerializer)
-from .utils import (check_and_add, check_and_delete_from_cart,
-                    check_and_delete_from_favorite, get_shopping_list)
+                          RecipeIdsSerializer, RecipeSerializer,
+                          ShoppingSerializer, TagSerializer)
+from .short_links import resolve_short_link
+from .utils import (bulk_change_membership, check_and_add,
+                    check_and_delete_from_cart, check_and_delete_from_favorite,
+                    clear_membership, get_shopping_list)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(VersionedSnapshotListMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тегов."""
 
+    snapshot_name = 'tags'
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     pagination_class = None
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(
+    VersionedSnapshotListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     """Вьюсет ингредиентов."""
 
+    snapshot_name = 'ingredients'
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return response.Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(
+    TimedViewMixin,
+    AnonymousResponseCacheMixin,
+    StreamingUploadMixin,
+    viewsets.ModelViewSet
+):
     """Вьюсет рецептов."""
 
     serializer_class = RecipeSerializer
-    queryset = Recipe.objects.all().prefetch_related(
-        'ingredients',
-        'tags',
-        'is_in_shopping_cart',
-    ). select_related('author')
+    queryset = Recipe.objects.all()
     filterset_class = RecipeFilter
+    pagination_class = KeysetLimitPagination
     permission_classes = (
         AuthenticatedOrReadOnlyRequest,
         IsAuthorAdminOrReadOnlyObject
     )
-    ordering_fields = ('name', 'created_at')
-    ordering = ('created_at', 'name',)
+    ordering_fields = ('name', 'pub_date')
+    ordering = ('-pub_date', '-id')
+    response_cache_params = ('page', 'limit', 'tags', 'tags_mode', 'author')
+    response_cache_multi_params = ('tags',)
+
+    def get_response_cache_tags(self):
+        tags = [AUTHORS_TAG, 'ingredients', 'tags']
+        if self.action == 'retrieve':
+            tags.append(recipe_tag(self.kwargs['pk']))
+        else:
+            tags.append(RECIPES_TAG)
+        return tags
+
+    def get_queryset(self):
+        return super().get_queryset().with_read_plan(self.request.user)
+
+    def get_serializer_class(self):
+        # Формы Browsable API строятся по полям обычного сериализатора.
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        if (
+            settings.FAST_READ_SERIALIZERS
+            and self.action in ('list', 'retrieve', 'feed')
+            and getattr(renderer, 'format', None) == 'json'
+        ):
+            return FastRecipeSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if (
+            self.action in ('list', 'retrieve', 'feed')
+            and user.is_authenticated
+        ):
+            context['favorited_ids'] = membership.recipe_ids(
+                user, 'favorites'
+            )
+            context['cart_ids'] = membership.recipe_ids(user, 'cart')
+        return context
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -113,6 +178,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_405_METHOD_NOT_ALLOWED
         )
 
+    @action(
+        ['POST', 'DELETE'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite_bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        return self.bulk_membership(request, 'favorites')
+
+    @action(
+        ['POST', 'DELETE'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping_cart_bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_membership(request, 'cart')
+
+    @action(
+        ['DELETE'],
+        detail=False,
+        url_path='shopping_cart/clear',
+        url_name='shopping_cart_clear',
+        permission_classes=(IsAuthenticated,),
+    )
+    def clear_shopping_cart(self, request):
+        clear_membership(request.user, 'cart')
+        return response.Response(status=status.HTTP_204_NO_CONTENT)
+
+    def bulk_membership(self, request, kind):
+        """
+        Добавляет (POST) или удаляет (DELETE) пачку рецептов из избранного
+        или корзины и возвращает результат по каждому id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_change_membership(
+            request.user,
+            kind,
+            serializer.validated_data['recipes'],
+            add=request.method == 'POST',
+        )
+        return response.Response(
+            {'results': results}, status=status.HTTP_200_OK
+        )
+
+    @action(
+        ['GET'],
+        detail=False,
+        url_path='feed',
+        url_name='feed',
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь, по курсору."""
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         ['GET'],
         detail=True,
@@ -147,10 +274,8 @@ class RecipeRedirectApiView(views.APIView):
     permission_classes = (AllowAny,)
 
     def get(self, request, *args, **kwargs):
-        link = kwargs.get('short_link')
-        recipe = get_object_or_404(
-            Recipe,
-            short_link=link
-        )
-        recipe_url = reverse('recipes-detail', kwargs={'pk': recipe.id})
+        recipe_id = resolve_short_link(kwargs.get('short_link'))
+        if recipe_id is None:
+            raise Http404('Рецепт не найден.')
+        recipe_url = reverse('recipes-detail', kwargs={'pk': recipe_id})
         return redirect(recipe_url)
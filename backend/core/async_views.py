@@ -0,0 +1,130 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotFound)
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.renderers import FastJSONRenderer
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+async def aauthenticate(request):
+    """Асинхронный аналог TokenAuthentication: заголовок 'Token <ключ>'."""
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        return AnonymousUser()
+    if len(header) != 2:
+        raise AuthenticationFailed('Недопустимый заголовок токена.')
+    token = await Token.objects.select_related('user').filter(
+        key=header[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        raise AuthenticationFailed('Недопустимый токен.')
+    return token.user
+
+
+def _in_own_connection(function):
+    def wrapper():
+        try:
+            return function()
+        finally:
+            connections.close_all()
+    return wrapper
+
+
+async def run_concurrently(*functions):
+    """
+    Выполняет независимые синхронные функции с запросами к БД и
+    возвращает их результаты по порядку.
+
+    При ASYNC_READ['PARALLEL_QUERIES'] каждая функция идет в своем потоке
+    со своим соединением, и запросы выполняются одновременно; иначе —
+    по очереди в потоке запроса, не блокируя цикл событий.
+    """
+    if not settings.ASYNC_READ['PARALLEL_QUERIES']:
+        return [await sync_to_async(function)() for function in functions]
+    return await asyncio.gather(*(
+        sync_to_async(_in_own_connection(function), thread_sensitive=False)()
+        for function in functions
+    ))
+
+
+class AsyncReadView(View):
+    """
+    Базовое асинхронное вью только для чтения: аутентифицирует по токену
+    и отдает ошибки DRF в том же JSON-формате, что и синхронные вью.
+    """
+
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await aauthenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as error:
+            # Как в rest_framework.views.exception_handler.
+            data = error.detail
+            if not isinstance(data, (list, dict)):
+                data = {'detail': data}
+            return json_response(data, status=error.status_code)
+
+
+class AsyncPageNumberPagination:
+    """
+    Параметры и ответ как у LimitNumberPagination: page и limit в запросе,
+    count/next/previous/results в ответе.
+    """
+
+    page_query_param = 'page'
+    page_size_query_param = 'limit'
+    invalid_page_message = PageNumberPagination.invalid_page_message
+
+    def __init__(self, request, page_size=None):
+        self.request = request
+        self.page_size = page_size or settings.REST_FRAMEWORK['PAGE_SIZE']
+        limit = request.GET.get(self.page_size_query_param, '')
+        if limit.isdigit() and int(limit) > 0:
+            self.page_size = int(limit)
+        page = request.GET.get(self.page_query_param, '1')
+        if not page.isdigit() or int(page) < 1:
+            raise NotFound(self.invalid_page_message)
+        self.page = int(page)
+
+    def slice(self, queryset):
+        offset = (self.page - 1) * self.page_size
+        return queryset[offset:offset + self.page_size]
+
+    def get_response(self, count, results):
+        if self.page > 1 and (self.page - 1) * self.page_size >= count:
+            raise NotFound(self.invalid_page_message)
+        return json_response({
+            'count': count,
+            'next': self.get_link(self.page + 1) if (
+                self.page * self.page_size < count
+            ) else None,
+            'previous': self.get_link(self.page - 1) if (
+                self.page > 1
+            ) else None,
+            'results': results,
+        })
+
+    def get_link(self, page):
+        url = self.request.build_absolute_uri()
+        if page == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page)
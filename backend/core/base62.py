@@ -0,0 +1,26 @@
+import string
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+
+
+def encode(number):
+    """Кодирует неотрицательное целое число в base62."""
+    if number == 0:
+        return ALPHABET[0]
+    code = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        code.append(ALPHABET[remainder])
+    return ''.join(reversed(code))
+
+
+def decode(code):
+    """Декодирует строку base62 или возвращает None для чужих символов."""
+    number = 0
+    for char in code:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        number = number * BASE + index
+    return number
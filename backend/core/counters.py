@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+
+_state = threading.local()
+
+
+def change_counter(model, pk, field, delta):
+    """
+    Атомарно меняет денормализованный счетчик field объекта pk на delta
+    одним UPDATE с F(), не опуская его ниже нуля.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def lock_row(model, pk):
+    """
+    Блокирует строку pk до конца транзакции. Изменения, которые
+    начинаются с этой блокировки, идут по очереди, поэтому состояние,
+    прочитанное после нее, совпадает с тем, что изменит запись.
+    """
+    list(
+        model.objects.select_for_update().filter(
+            pk=pk
+        ).values_list('pk', flat=True)
+    )
+
+
+@contextmanager
+def counted_in_bulk():
+    """
+    Внутри блока счетчики меняет сам вызывающий код одним UPDATE на
+    пачку строк, а обработчики сигналов отдельных строк их не трогают.
+    """
+    previous = getattr(_state, 'bulk', False)
+    _state.bulk = True
+    try:
+        yield
+    finally:
+        _state.bulk = previous
+
+
+def counted_by_signals():
+    return not getattr(_state, 'bulk', False)
@@ -0,0 +1,168 @@
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Копии лежат в MEDIA_ROOT по хешу исходника и никогда не меняются.
+VARIANTS_DIR = 'derivatives'
+
+PILLOW_FORMATS = {
+    'avif': 'AVIF',
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+# Отправляется после записи карты копий: sender — модель, queryset —
+# обновленные объекты. Запись идет через update(), без post_save.
+variants_updated = Signal()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variants_field(field_name):
+    """Имя поля модели, в котором хранится карта копий поля field_name."""
+    return f'{field_name}_variants'
+
+
+def available_formats():
+    """Форматы из настроек, которые умеет кодировать установленный Pillow."""
+    return [
+        fmt for fmt in settings.IMAGE_VARIANTS['FORMATS']
+        if fmt in PILLOW_FORMATS and (fmt == 'jpeg' or features.check(fmt))
+    ]
+
+
+def build_variants(name):
+    """
+    Строит уменьшенные копии изображения name во всех форматах и
+    возвращает карту srcset: {формат: {ширина: путь в хранилище}}.
+
+    Путь копии зависит только от содержимого исходника, поэтому
+    одинаковые файлы обрабатываются один раз.
+    """
+    with default_storage.open(name, 'rb') as file:
+        content = file.read()
+    digest = hashlib.sha256(content).hexdigest()
+    prefix = f'{VARIANTS_DIR}/{digest[:2]}/{digest}'
+
+    # Image.open читает только заголовок: декодирование — по необходимости.
+    image = Image.open(io.BytesIO(content))
+    widths = [
+        width for width in settings.IMAGE_VARIANTS['WIDTHS']
+        if width < image.width
+    ] or [image.width]
+    decoded = None
+    srcset = {}
+    for fmt in available_formats():
+        srcset[fmt] = {}
+        for width in widths:
+            path = f'{prefix}/{width}.{fmt}'
+            if not default_storage.exists(path):
+                if decoded is None:
+                    decoded = _decode(image)
+                path = default_storage.save(
+                    path, ContentFile(_encode(decoded, width, fmt))
+                )
+            srcset[fmt][str(width)] = path
+    return srcset
+
+
+def _decode(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _encode(image, width, fmt):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize(
+        (width, height), Image.Resampling.LANCZOS, reducing_gap=2.0
+    )
+    if fmt == 'jpeg':
+        resized = resized.convert('RGB')
+    buffer = io.BytesIO()
+    resized.save(
+        buffer,
+        PILLOW_FORMATS[fmt],
+        quality=settings.IMAGE_VARIANTS['QUALITY'],
+    )
+    return buffer.getvalue()
+
+
+def update_variants(model, field_name, name):
+    """
+    Строит копии исходника name и записывает карту во все объекты model,
+    у которых в поле field_name лежит этот файл.
+    """
+    srcset = build_variants(name)
+    queryset = model.objects.filter(**{field_name: name})
+    queryset.update(**{
+        variants_field(field_name): {'source': name, 'srcset': srcset}
+    })
+    variants_updated.send(sender=model, queryset=queryset)
+
+
+def refresh_image_variants(instance, field_name, update_fields=None):
+    """
+    Ставит в очередь построение копий, если исходник изменился.
+
+    Работа начинается после коммита транзакции в пуле потоков
+    (IMAGE_VARIANTS['WORKERS']); при нуле потоков — сразу в текущем.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+    model = type(instance)
+    name = getattr(instance, field_name).name
+    variants = getattr(instance, variants_field(field_name))
+    if not name:
+        if variants:
+            setattr(instance, variants_field(field_name), {})
+            queryset = model.objects.filter(pk=instance.pk)
+            queryset.update(**{variants_field(field_name): {}})
+            variants_updated.send(sender=model, queryset=queryset)
+        return
+    if variants.get('source') == name:
+        return
+    transaction.on_commit(
+        lambda: _submit(model, field_name, name)
+    )
+
+
+def _submit(model, field_name, name):
+    if not settings.IMAGE_VARIANTS['WORKERS']:
+        _run(model, field_name, name)
+        return
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANTS['WORKERS'],
+                thread_name_prefix='image-variants',
+            )
+    _executor.submit(_run_in_worker, model, field_name, name)
+
+
+def _run(model, field_name, name):
+    try:
+        update_variants(model, field_name, name)
+    except Exception:
+        logger.exception('Не удалось построить копии изображения %s', name)
+
+
+def _run_in_worker(model, field_name, name):
+    try:
+        _run(model, field_name, name)
+    finally:
+        connections.close_all()
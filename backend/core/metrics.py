@@ -0,0 +1,374 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+# Описание метрик: тип и подсказка для формата Prometheus.
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Число ответов по маршруту, методу и статусу.'
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса в секундах.'
+    ),
+    'http_request_db_queries': (
+        'histogram', 'Число SQL-запросов на один запрос.'
+    ),
+    'http_requests_in_flight': (
+        'gauge', 'Запросы, которые обрабатываются сейчас.'
+    ),
+    'cache_requests_total': (
+        'counter', 'Обращения к кешам: попадания и промахи.'
+    ),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsRegistry:
+    """
+    Счетчики, гистограммы и gauge в памяти процесса.
+
+    Серии хранятся по ключу (имя, метки), где метки — кортеж пар.
+    В многопроцессном режиме (METRICS['MULTIPROCESS_DIR']) фоновый поток
+    раз в FLUSH_INTERVAL секунд записывает снимок процесса в файл
+    <pid>.json, а сбор метрик суммирует файлы всех воркеров gunicorn.
+    """
+
+    def __init__(self):
+        # Включается при подключении MetricsMiddleware.
+        self.enabled = False
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = defaultdict(float)
+        self._histograms = {}
+        self._request_series = {}
+        self._flusher_started = False
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._counters[name, labels] += value
+
+    def add_gauge(self, name, labels, value):
+        with self._lock:
+            self._gauges[name, labels] += value
+
+    def observe(self, name, labels, value, buckets):
+        """Добавляет value в гистограмму с верхними границами buckets."""
+        with self._lock:
+            self._observe(name, labels, value, buckets)
+
+    def record_request(self, route, method, status, duration, queries,
+                       latency_buckets, query_buckets):
+        """
+        Записывает метрики завершенного запроса под одной блокировкой:
+        ключи и гистограммы серии кешируются, чтобы не собирать их заново.
+        """
+        with self._lock:
+            series = self._request_series.get((route, method, status))
+            if series is None:
+                series = self._new_request_series(
+                    route, method, status, latency_buckets, query_buckets
+                )
+            counter_key, in_flight_key, durations, query_counts = series
+            self._counters[counter_key] += 1
+            self._gauges[in_flight_key] -= 1
+            durations[1][bisect_left(latency_buckets, duration)] += 1
+            durations[2] += duration
+            query_counts[1][bisect_left(query_buckets, queries)] += 1
+            query_counts[2] += queries
+
+    def _new_request_series(self, route, method, status, latency_buckets,
+                            query_buckets):
+        labels = (('route', route), ('method', method))
+        series = self._request_series[route, method, status] = (
+            ('http_requests_total', (*labels, ('status', str(status)))),
+            ('http_requests_in_flight', (('route', route),)),
+            self._get_histogram(
+                'http_request_duration_seconds', labels, latency_buckets
+            ),
+            self._get_histogram(
+                'http_request_db_queries', labels, query_buckets
+            ),
+        )
+        return series
+
+    def _observe(self, name, labels, value, buckets):
+        histogram = self._get_histogram(name, labels, buckets)
+        histogram[1][bisect_left(buckets, value)] += 1
+        histogram[2] += value
+
+    def _get_histogram(self, name, labels, buckets):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[name, labels] = [
+                buckets, [0] * (len(buckets) + 1), 0.0
+            ]
+        return histogram
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [
+                    [name, labels, value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                'gauges': [
+                    [name, labels, value]
+                    for (name, labels), value in self._gauges.items()
+                ],
+                'histograms': [
+                    [name, labels, buckets, list(counts), total]
+                    for (name, labels), (buckets, counts, total)
+                    in self._histograms.items()
+                ],
+            }
+
+    def start_flusher(self):
+        """
+        Запускает в процессе фоновую запись снимков, если включен общий
+        каталог. Повторные вызовы ничего не делают.
+        """
+        if self._flusher_started:
+            return
+        with self._lock:
+            if self._flusher_started:
+                return
+            self._flusher_started = True
+        if _multiprocess_dir():
+            threading.Thread(
+                target=self._flush_forever,
+                name='metrics-flusher',
+                daemon=True,
+            ).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(settings.METRICS['FLUSH_INTERVAL'])
+            self.flush()
+
+    def flush(self):
+        directory = _multiprocess_dir()
+        if not directory:
+            return
+        data = json.dumps(self.snapshot())
+        # Запись через временный файл: читатель не увидит его наполовину.
+        descriptor, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(data)
+        os.replace(path, os.path.join(directory, f'{os.getpid()}.json'))
+
+    def collect(self):
+        """
+        Возвращает снимки для экспорта: свой или, в многопроцессном
+        режиме, снимки всех воркеров, включая завершившиеся (их счетчики
+        продолжают учитываться, а gauge — нет).
+        """
+        directory = _multiprocess_dir()
+        if not directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for file_name in os.listdir(directory):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if not _is_alive(snapshot['pid']):
+                snapshot['gauges'] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+
+def _multiprocess_dir():
+    return settings.METRICS['MULTIPROCESS_DIR']
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels_text(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render_metrics(snapshots):
+    """Сводит снимки процессов и выводит их в текстовом формате Prometheus."""
+    counters = defaultdict(float)
+    gauges = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, value in snapshot['gauges']:
+            gauges[name, tuple(map(tuple, labels))] += value
+        for name, labels, buckets, counts, total in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)), tuple(buckets))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+
+    series = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        series[name].append(f'{name}{_labels_text(labels)} {value:g}')
+    for (name, labels), value in sorted(gauges.items()):
+        series[name].append(f'{name}{_labels_text(labels)} {value:g}')
+    for (name, labels, buckets), (counts, total) in sorted(
+        histograms.items()
+    ):
+        cumulative = 0
+        for bound, count in zip((*buckets, '+Inf'), counts):
+            cumulative += count
+            series[name].append(
+                f'{name}_bucket'
+                f'{_labels_text(labels, [("le", bound)])} {cumulative}'
+            )
+        series[name].append(f'{name}_sum{_labels_text(labels)} {total:g}')
+        series[name].append(
+            f'{name}_count{_labels_text(labels)} {cumulative}'
+        )
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        if name not in series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(series[name])
+    return '\n'.join(lines) + '\n'
+
+
+def record_cache(cache_name, hit):
+    """Учитывает обращение к кешу cache_name в метрике cache_requests_total."""
+    if registry.enabled:
+        registry.inc(
+            'cache_requests_total',
+            (('cache', cache_name), ('result', 'hit' if hit else 'miss')),
+        )
+
+
+# Счетчик SQL-запросов потока: обертка ставится на соединение один раз,
+# а middleware берет разницу до и после запроса.
+class _QueryCount(threading.local):
+    count = 0
+
+
+_queries = _QueryCount()
+
+
+def _count_query(execute, sql, params, many, context):
+    _queries.count += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики по именованным маршрутам: число ответов по статусам,
+    гистограммы времени и числа SQL-запросов и запросы в обработке.
+
+    Выключенное в METRICS middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.latency_buckets = tuple(settings.METRICS['LATENCY_BUCKETS'])
+        self.query_buckets = tuple(settings.METRICS['QUERY_BUCKETS'])
+        registry.enabled = True
+        connection_created.connect(_install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection)
+
+    def __call__(self, request):
+        # Поток записи стартует в воркере, а не в мастере gunicorn.
+        registry.start_flusher()
+        queries_before = _queries.count
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            route = getattr(request, 'metrics_route', None)
+            if route is not None:
+                registry.add_gauge(
+                    'http_requests_in_flight', (('route', route),), -1
+                )
+            raise
+        duration = time.perf_counter() - start
+        route = getattr(request, 'metrics_route', None)
+        if route is not None:
+            registry.record_request(
+                route,
+                request.method,
+                response.status_code,
+                duration,
+                _queries.count - queries_before,
+                self.latency_buckets,
+                self.query_buckets,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = request.resolver_match.view_name
+        if route:
+            request.metrics_route = route
+            registry.add_gauge(
+                'http_requests_in_flight', (('route', route),), 1
+            )
+
+
+def metrics_view(request):
+    """
+    Отдает метрики всех воркеров в текстовом формате Prometheus.
+
+    Если задан METRICS['TOKEN'], нужен заголовок
+    Authorization: Bearer <токен>.
+    """
+    token = settings.METRICS['TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        raise PermissionDenied()
+    return HttpResponse(
+        render_metrics(registry.collect()), content_type=CONTENT_TYPE
+    )
+
+
+registry = MetricsRegistry()
+
+# Воркер gunicorn начинает с пустым реестром и своим потоком записи.
+os.register_at_fork(after_in_child=registry._reset)
+atexit.register(registry.flush)
@@ -0,0 +1,72 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from core.metrics import record_cache
+from core.renderers import FastJSONRenderer
+from core.uploads import LimitedTemporaryFileUploadHandler
+from core.versioning import get_data_version
+
+
+class VersionedSnapshotListMixin:
+    """
+    Отдает список объектов как снимок, закешированный на версию данных.
+
+    Готовый JSON хранится в кеше вместе со строгим ETag от его содержимого,
+    поэтому повторные запросы не обращаются к БД и сериализатору, а
+    клиенты с актуальным If-None-Match получают 304.
+    """
+
+    snapshot_name = None
+
+    def list(self, request, *args, **kwargs):
+        snapshot = get_snapshot(
+            self.snapshot_name,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+        )
+        return snapshot_response(request, snapshot)
+
+
+def get_snapshot(name, get_data):
+    """
+    Возвращает (etag, body) снимка name для текущей версии данных;
+    get_data строит данные снимка, если его нет в кеше.
+    """
+    version = get_data_version(name)
+    cache_key = f'snapshot:{name}:{version}'
+    snapshot = cache.get(cache_key)
+    record_cache('snapshots', snapshot is not None)
+    if snapshot is None:
+        body = FastJSONRenderer().render(get_data())
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        snapshot = (etag, body)
+        cache.set(cache_key, snapshot, None)
+    return snapshot
+
+
+def snapshot_response(request, snapshot):
+    etag, body = snapshot
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f'public, max-age={settings.REFERENCE_DATA_MAX_AGE}'
+    )
+    return response
+
+
+class StreamingUploadMixin:
+    """
+    Принимает файлы из multipart/form-data сразу во временные файлы
+    частями, без буфера в памяти, с ограничением размера.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -1,7 +1,172 @@
+import json
+
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class LimitNumberPagination(PageNumberPagination):
     """Класс пагинации с доп. параметром limit."""
 
     page_size_query_param = 'limit'
+
+
+class KeysetLimitPagination(LimitNumberPagination):
+    """
+    Пагинация с доп. режимом курсора по ключу (pub_date, id).
+
+    Без параметра cursor работает как LimitNumberPagination. С параметром
+    cursor (пустым для первой страницы) отдает страницы по подписанному
+    курсору без OFFSET, а count считается только по запросу:
+    count=exact — точно, count=approx — по оценке планировщика.
+
+    Если у кверисета есть аннотация rank_field (релевантность поиска),
+    ключом становится (rank_field, pub_date, id) и порядок по
+    релевантности сохраняется между страницами.
+    """
+
+    cursor_query_param = 'cursor'
+    rank_field = 'search_rank'
+    count_query_param = 'count'
+    cursor_salt = 'core.pagination.cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+        self.ranked = self.rank_field in queryset.query.annotations
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+
+        page = self.get_keyset_page(queryset, cursor, reverse)
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.next_item = page[-1] if page and (has_more or reverse) else None
+        self.previous_item = (
+            page[0] if page and (cursor is not None and (
+                not reverse or has_more
+            )) else None
+        )
+        return page
+
+    def use_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_keyset_page(self, queryset, cursor, reverse):
+        """
+        Возвращает до page_size + 1 объектов после курсора в порядке
+        обхода: лишний объект показывает, что есть следующая страница.
+        """
+        return list(
+            keyset_filter(
+                queryset, cursor, reverse,
+                rank_field=self.rank_field if self.ranked else None,
+            )[:self.page_size + 1]
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_cursor_link(self.next_item, reverse=False),
+            'previous': self.get_cursor_link(
+                self.previous_item, reverse=True
+            ),
+            'results': data,
+        })
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = signing.loads(token, salt=self.cursor_salt)
+        except signing.BadSignature:
+            raise NotFound(self.invalid_cursor_message)
+        # Курсор страницы без поиска не подходит к выдаче поиска и наоборот.
+        if ('rank' in cursor) != self.ranked:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_cursor_link(self, item, reverse):
+        if item is None:
+            return None
+        data = {
+            'pub_date': item.pub_date.isoformat(),
+            'id': item.id,
+            'reverse': reverse,
+        }
+        if self.ranked:
+            data['rank'] = getattr(item, self.rank_field)
+        token = signing.dumps(data, salt=self.cursor_salt)
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, token)
+
+
+def keyset_filter(queryset, cursor, reverse, id_field='id', rank_field=None):
+    """
+    Оставляет строки после курсора по ключу (pub_date, id_field), а
+    с rank_field — (rank_field, pub_date, id_field), и сортирует их
+    по убыванию ключа, а при reverse — по возрастанию.
+    """
+    fields = ['pub_date', id_field]
+    if rank_field is not None:
+        fields.insert(0, rank_field)
+    if cursor is not None:
+        values = [parse_datetime(cursor['pub_date']), cursor['id']]
+        if rank_field is not None:
+            values.insert(0, cursor['rank'])
+        lookup = 'gt' if reverse else 'lt'
+        # (a, b, c) < (x, y, z): a < x, или a = x и b < y, или ...
+        condition = Q()
+        for position, (field, value) in enumerate(zip(fields, values)):
+            condition |= Q(
+                **dict(zip(fields[:position], values[:position])),
+                **{f'{field}__{lookup}': value},
+            )
+        queryset = queryset.filter(condition)
+    if reverse:
+        return queryset.order_by(*fields)
+    return queryset.order_by(*(f'-{field}' for field in fields))
+
+
+def estimate_count(queryset):
+    """
+    Оценивает число строк кверисета по плану запроса PostgreSQL.
+
+    На остальных СУБД возвращает точный count().
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,214 @@
+import threading
+import zlib
+from pathlib import Path
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import (FF_NONSYMBOLIC, FF_SYMBOLIC, SUBSETN,
+                                       TTFont, makeToUnicodeCMap)
+
+FONT_NAME = 'DejaVuSans'
+FONT_PATH = Path(__file__).resolve().parent / 'fonts' / 'DejaVuSans.ttf'
+
+_font = None
+_font_lock = threading.Lock()
+
+
+def get_font():
+    """Шрифт с кириллицей, один на процесс: разбор TTF занимает время."""
+    global _font
+    with _font_lock:
+        if _font is None:
+            _font = TTFont(FONT_NAME, str(FONT_PATH))
+            pdfmetrics.registerFont(_font)
+        return _font
+
+
+class StreamingPDF:
+    """
+    PDF, который отдается по страницам: каждая страница уходит клиенту,
+    как только набрано её содержимое, а подмножество шрифта с
+    использованными символами, дерево страниц и таблица xref пишутся
+    в конце. В памяти держится только текущая страница.
+
+    Подмножества шрифта строятся внутренними методами reportlab
+    (TTFont.splitString, TTFontFace.makeSubset), поэтому версия reportlab
+    в requirements.txt зафиксирована точно.
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    RESOURCES_ID = 3
+
+    def __init__(self, font_size=11, leading=15, margin=50, page_size=A4):
+        self.font = get_font()
+        self.font_size = font_size
+        self.leading = leading
+        self.margin = margin
+        self.width, self.height = page_size
+        self.lines_per_page = int(
+            (self.height - 2 * margin) // leading
+        )
+        self.offsets = {}
+        self.position = 0
+        self.next_id = self.RESOURCES_ID + 1
+        self.page_ids = []
+
+    def stream(self, lines):
+        """
+        Генератор байтов документа; длинные строки переносятся.
+
+        Подмножества символов шрифт хранит в своем состоянии по ключу
+        документа; оно удаляется и тогда, когда клиент прервал загрузку
+        и генератор закрыт раньше времени.
+        """
+        try:
+            yield self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+            max_width = self.width - 2 * self.margin
+            page = []
+            for line in lines:
+                for part in simpleSplit(
+                    line, FONT_NAME, self.font_size, max_width
+                ) or ['']:
+                    page.append(part)
+                    if len(page) == self.lines_per_page:
+                        yield self._page(page)
+                        page = []
+            if page or not self.page_ids:
+                yield self._page(page)
+            yield self._finish()
+        finally:
+            self.font.state.pop(self, None)
+
+    def _write(self, data):
+        self.position += len(data)
+        return data
+
+    def _new_id(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        return self._write(
+            b'%d 0 obj\n%s\nendobj\n' % (object_id, body)
+        )
+
+    def _stream(self, object_id, content, entries=b''):
+        compressed = zlib.compress(content)
+        return self._object(
+            object_id,
+            b'<< /Length %d /Filter /FlateDecode%s >>\nstream\n%s\nendstream'
+            % (len(compressed), entries, compressed),
+        )
+
+    def _text(self, text):
+        """Оператор Tj для каждой части строки в своем подмножестве."""
+        return b''.join(
+            b'/F%d %d Tf <%s> Tj\n' % (
+                subset, self.font_size, chunk.hex().encode()
+            )
+            for subset, chunk in self.font.splitString(text, self)
+        )
+
+    def _page(self, lines):
+        number = len(self.page_ids) + 1
+        content = [
+            b'BT\n%d TL\n%.2f %.2f Td\n' % (
+                self.leading,
+                self.margin,
+                self.height - self.margin - self.font_size,
+            )
+        ]
+        for line in lines:
+            content.append(self._text(line) + b'T*\n')
+        content.append(b'ET\nBT\n%.2f %.2f Td\n' % (
+            self.width / 2, self.margin / 2
+        ))
+        content.append(self._text(str(number)) + b'ET\n')
+        content_id = self._new_id()
+        page_id = self._new_id()
+        self.page_ids.append(page_id)
+        return self._stream(content_id, b''.join(content)) + self._object(
+            page_id,
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] '
+            b'/Resources %d 0 R /Contents %d 0 R >>' % (
+                self.PAGES_ID, self.width, self.height,
+                self.RESOURCES_ID, content_id,
+            ),
+        )
+
+    def _finish(self):
+        face = self.font.face
+        parts = []
+        fonts = []
+        for number, subset in enumerate(self.font.state[self].subsets):
+            name = SUBSETN(number) + b'+' + face.name
+            with _font_lock:
+                font_file = face.makeSubset(subset)
+            file_id = self._new_id()
+            parts.append(self._stream(
+                file_id, font_file, b' /Length1 %d' % len(font_file)
+            ))
+            cmap_id = self._new_id()
+            parts.append(self._stream(
+                cmap_id, makeToUnicodeCMap(name.decode(), subset).encode()
+            ))
+            descriptor_id = self._new_id()
+            parts.append(self._object(
+                descriptor_id,
+                b'<< /Type /FontDescriptor /FontName /%s /Flags %d '
+                b'/FontBBox [%s] /ItalicAngle %d /Ascent %d /Descent %d '
+                b'/CapHeight %d /StemV %d /MissingWidth %d '
+                b'/FontFile2 %d 0 R >>' % (
+                    name,
+                    face.flags & ~FF_NONSYMBOLIC | FF_SYMBOLIC,
+                    b' '.join(b'%d' % value for value in face.bbox),
+                    face.italicAngle, face.ascent, face.descent,
+                    face.capHeight, face.stemV, face.defaultWidth, file_id,
+                ),
+            ))
+            font_id = self._new_id()
+            parts.append(self._object(
+                font_id,
+                b'<< /Type /Font /Subtype /TrueType /BaseFont /%s '
+                b'/FirstChar 0 /LastChar %d /Widths [%s] '
+                b'/FontDescriptor %d 0 R /ToUnicode %d 0 R >>' % (
+                    name,
+                    len(subset) - 1,
+                    b' '.join(
+                        b'%d' % face.getCharWidth(code) for code in subset
+                    ),
+                    descriptor_id,
+                    cmap_id,
+                ),
+            ))
+            fonts.append(b'/F%d %d 0 R' % (number, font_id))
+
+        parts.append(self._object(
+            self.RESOURCES_ID, b'<< /Font << %s >> >>' % b' '.join(fonts)
+        ))
+        parts.append(self._object(
+            self.PAGES_ID,
+            b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids),
+                len(self.page_ids),
+            ),
+        ))
+        parts.append(self._object(
+            self.CATALOG_ID,
+            b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES_ID,
+        ))
+        xref_position = self.position
+        parts.append(
+            b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id
+            + b''.join(
+                b'%010d 00000 n \n' % self.offsets[object_id]
+                for object_id in range(1, self.next_id)
+            )
+            + b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (self.next_id, self.CATALOG_ID, xref_position)
+        )
+        return b''.join(parts)
@@ -0,0 +1,50 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson is not None else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson.
+
+    Дает те же байты, что JSONRenderer с настройками по умолчанию
+    (компактный вывод, UTF-8 без экранирования, U+2028/U+2029
+    экранируются): типы, которых orjson не знает, включая даты,
+    переводятся кодировщиком DRF. Без orjson, с отступами (indent) или
+    при других настройках COMPACT_JSON/UNICODE_JSON работает как
+    JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(
+                accepted_media_type or '', renderer_context or {}
+            )
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except TypeError:
+            # Например, целые больше 64 бит: их выводит стандартный json.
+            return super().render(data, accepted_media_type, renderer_context)
+        return rendered.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
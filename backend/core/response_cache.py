@@ -0,0 +1,106 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+from core.metrics import record_cache
+from core.renderers import FastJSONRenderer
+from core.versioning import get_data_versions
+
+CACHE_HIT = 'HIT'
+CACHE_MISS = 'MISS'
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кеширует ответы list и retrieve для анонимных GET-запросов.
+
+    Ответ хранится вместе с версиями своих тегов (core.versioning) и
+    считается устаревшим, как только сменилась версия любого из них,
+    поэтому сброс — это bump_data_version нужного тега. Запросы с
+    параметрами вне response_cache_params и запросы не в формате JSON
+    (например, Browsable API) в кеш не попадают.
+    """
+
+    response_cache_params = ()
+    # Параметры, у которых важен набор значений, а не их порядок.
+    response_cache_multi_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_response_cache_tags(self):
+        raise NotImplementedError
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        tags = self.get_response_cache_tags()
+        versions = get_data_versions(tags)
+        response_cache = caches[settings.RESPONSE_CACHE['ALIAS']]
+        entry = response_cache.get(key)
+        if entry is not None and entry[1] == versions:
+            record_cache('responses', True)
+            return self.make_cached_response(entry[0], tags, CACHE_HIT)
+        record_cache('responses', False)
+
+        # Версии прочитаны до построения ответа: если данные изменятся
+        # во время построения, запись сразу окажется устаревшей.
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        body = FastJSONRenderer().render(response.data)
+        response_cache.set(
+            key, (body, versions), settings.RESPONSE_CACHE['TIMEOUT']
+        )
+        return self.make_cached_response(body, tags, CACHE_MISS)
+
+    def get_response_cache_key(self, request):
+        """
+        Ключ из пути и нормализованных параметров запроса или None,
+        если ответ кешировать нельзя.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if request.user.is_authenticated:
+            return None
+        renderer = getattr(request, 'accepted_renderer', None)
+        if getattr(renderer, 'format', None) != 'json':
+            return None
+        params = []
+        for name in sorted(request.query_params):
+            if name not in self.response_cache_params:
+                return None
+            values = [
+                value for value in request.query_params.getlist(name)
+                if value
+            ]
+            if name in self.response_cache_multi_params:
+                values = sorted(set(values))
+            params.extend((name, value) for value in values)
+        normalized = (
+            f'{request.scheme}://{request.get_host()}{request.path}'
+            f'?{urlencode(params)}'
+        )
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+        return f'response:{digest}'
+
+    def make_cached_response(self, body, tags, status):
+        cached_response = HttpResponse(body, content_type='application/json')
+        cached_response['Cache-Control'] = (
+            f'public, max-age={settings.RESPONSE_CACHE["MAX_AGE"]}'
+        )
+        cached_response['Vary'] = 'Accept, Authorization'
+        cached_response['Surrogate-Key'] = ' '.join(
+            tag.replace(':', '-') for tag in tags
+        )
+        cached_response['X-Response-Cache'] = status
+        return cached_response
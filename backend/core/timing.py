@@ -0,0 +1,211 @@
+import json
+import logging
+import random
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Замеры текущего запроса; None, если middleware не подключено.
+_current_timings = ContextVar('request_timings', default=None)
+
+# Списки IN разной длины дают один и тот же отпечаток запроса.
+IN_PARAMS = re.compile(r'\((?:%s, )+%s\)')
+
+
+class RequestTimings:
+    """
+    Замеры одного запроса: время по этапам, число и время SQL-запросов
+    и отпечатки SQL с полем сериализатора, при чтении которого они
+    выполнены.
+
+    Объект подключается к соединению как execute_wrapper.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.query_count = 0
+        self.fingerprints = {}
+        self._fields = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            self.query_count += 1
+            self.add('db', duration)
+            stats = self.fingerprints.setdefault(
+                IN_PARAMS.sub('(%s...)', sql),
+                {'count': 0, 'field': None},
+            )
+            stats['count'] += 1
+            if stats['field'] is None and self._fields:
+                stats['field'] = self._fields[-1]
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+    def track_fields(self, serializer_name, fields):
+        """Отмечает поле, которое сериализатор читает в данный момент."""
+        for field in fields:
+            self._fields.append(f'{serializer_name}.{field.field_name}')
+            try:
+                yield field
+            finally:
+                self._fields.pop()
+
+    def duplicates(self):
+        threshold = settings.REQUEST_TIMING['DUPLICATE_QUERIES']
+        return [
+            {'sql': sql, **stats}
+            for sql, stats in self.fingerprints.items()
+            if stats['count'] >= threshold
+        ]
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к метрике name текущего запроса."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет каждый запрос: SQL (число и время), аутентификацию и права,
+    сериализацию и рендеринг. Результат отдается в заголовке
+    Server-Timing и, для доли запросов LOG_SAMPLE_RATE, в json-строке лога.
+
+    Повторяющиеся SQL-запросы (N+1) пишутся в лог с именем вью и полем
+    сериализатора. Выключенное в REQUEST_TIMING middleware не
+    подключается к обработке запросов.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.timings = timings
+        token = _current_timings.set(timings)
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        timings.add('total', perf_counter() - start)
+        self.report(request, response, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        start = perf_counter()
+        response.add_post_render_callback(
+            lambda rendered: request.timings.add(
+                'render', perf_counter() - start
+            )
+        )
+        return response
+
+    def report(self, request, response, timings):
+        metrics = [
+            f'db;dur={timings.durations.get("db", 0) * 1000:.1f};'
+            f'desc="{timings.query_count} queries"'
+        ]
+        metrics.extend(
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in timings.durations.items()
+            if name != 'db'
+        )
+        duplicates = timings.duplicates()
+        if duplicates:
+            metrics.append(
+                f'dup;desc="{len(duplicates)} repeated queries"'
+            )
+        response['Server-Timing'] = ', '.join(metrics)
+
+        view = getattr(request.resolver_match, 'view_name', None)
+        for duplicate in duplicates:
+            logger.warning(
+                'Повторяющийся SQL-запрос (%s раз): вью %s, поле %s: %s',
+                duplicate['count'], view, duplicate['field'],
+                duplicate['sql'],
+            )
+        if random.random() < settings.REQUEST_TIMING['LOG_SAMPLE_RATE']:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'queries': timings.query_count,
+                'timings_ms': {
+                    name: round(duration * 1000, 1)
+                    for name, duration in timings.durations.items()
+                },
+                'duplicates': [
+                    {
+                        'count': duplicate['count'],
+                        'field': duplicate['field'],
+                    }
+                    for duplicate in duplicates
+                ],
+            }, ensure_ascii=False))
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """Список, время сериализации которого идет в метрику serialize."""
+
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Время сериализации идет в метрику serialize, а SQL-запросы,
+    выполненные при чтении полей, помечаются именем поля.
+
+    Для списков в Meta указывается
+    list_serializer_class = TimedListSerializer.
+    """
+
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+    @property
+    def _readable_fields(self):
+        timings = _current_timings.get()
+        if timings is None:
+            return super()._readable_fields
+        return timings.track_fields(
+            type(self).__name__, super()._readable_fields
+        )
+
+
+class TimedViewMixin:
+    """Время аутентификации, проверки прав и троттлинга — метрика auth."""
+
+    def initial(self, request, *args, **kwargs):
+        with measure('auth'):
+            super().initial(request, *args, **kwargs)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл превышает допустимый размер.'
+    default_code = 'upload_too_large'
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загружаемые файлы во временные файлы по частям и прерывает
+    загрузку, как только файл превысил IMAGE_UPLOAD['MAX_SIZE'].
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_UPLOAD['MAX_SIZE']:
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
@@ -0,0 +1,37 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f'data-version:{name}'
+
+
+def get_data_version(name):
+    """
+    Возвращает текущую версию набора данных name.
+
+    Версия хранится в общем кеше, поэтому одинакова во всех воркерах.
+    """
+    return cache.get_or_set(_version_key(name), uuid.uuid4().hex, None)
+
+
+def bump_data_version(name):
+    """Выдает набору данных name новую версию."""
+    cache.set(_version_key(name), uuid.uuid4().hex, None)
+
+
+def get_data_versions(names):
+    """
+    Возвращает словарь name -> версия для нескольких наборов данных
+    одним обращением к кешу; недостающие версии создаются.
+    """
+    keys = {_version_key(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = {
+        key: uuid.uuid4().hex for key in keys if key not in found
+    }
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
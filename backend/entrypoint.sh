@@ -1,3 +1,12 @@
 python manage.py makemigrations --no-input
 python manage.py migrate --no-input
-gunicorn --bind 0.0.0.0:8000 shades_of_flavor.wsgi
\ No newline at end of file
+# Снимки метрик прошлого запуска не должны попасть в новые счетчики.
+if [ -n "$METRICS_MULTIPROCESS_DIR" ]; then
+    rm -rf "$METRICS_MULTIPROCESS_DIR"
+    mkdir -p "$METRICS_MULTIPROCESS_DIR"
+fi
+if [ "$ASGI" = "True" ]; then
+    gunicorn --bind 0.0.0.0:8000 -k uvicorn.workers.UvicornWorker shades_of_flavor.asgi:application
+else
+    gunicorn --bind 0.0.0.0:8000 shades_of_flavor.wsgi
+fi
@@ -37,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,40 @@ else:
     }
 
 
+# Кеш должен быть общим для всех воркеров gunicorn: через него процессы
+# узнают о смене версий данных, закешированных в памяти. В Docker это
+# Redis (REDIS_URL). Без него, при локальной разработке, — файловый кеш
+# с небольшим лимитом: FileBasedCache при каждой записи обходит весь
+# каталог, а при переполнении удаляет случайную треть записей.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1000))
+
+if REDIS_URL:
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/shades_of_flavor_cache'),
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    }
+
+CACHES = {
+    'default': DEFAULT_CACHE,
+    # Готовые ответы API для анонимных пользователей в памяти процесса:
+    # версии тегов для сброса хранятся в общем кеше default.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -143,6 +179,11 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 DJOSER = {
@@ -165,3 +206,120 @@ POSITIVE_SMALL_INTEGER_MIN = 1
 POSITIVE_SMALL_INTEGER_MAX = 32000
 
 SUBSCRIPTIONS_PAGE_SIZE = 10
+
+SHOPPING_LIST_CHUNK_SIZE = 2000
+
+# Максимум рецептов в одном пакетном запросе к избранному и корзине.
+BULK_RECIPES_LIMIT = 100
+
+# Конфигурация полнотекстового поиска PostgreSQL.
+SEARCH_CONFIG = 'russian'
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
+# Время жизни снимков тегов и ингредиентов в кеше клиентов (секунды).
+# После его истечения клиент перепроверяет снимок по ETag.
+REFERENCE_DATA_MAX_AGE = int(os.getenv('REFERENCE_DATA_MAX_AGE', 86400))
+
+# Размер и время жизни записей (секунды) LRU-кеша коротких ссылок
+# в каждом процессе и использование общего кеша для старых ссылок.
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 60))
+SHORT_LINK_SHARED_CACHE = os.getenv('SHORT_LINK_SHARED_CACHE', 'True') == 'True'
+
+# Кеш избранного и корзин пользователей: 'local' — в памяти процесса,
+# 'shared' — в общем кеше для всех воркеров.
+MEMBERSHIP_CACHE = {
+    'BACKEND': os.getenv('MEMBERSHIP_CACHE_BACKEND', 'shared'),
+    'MAX_USERS': int(os.getenv('MEMBERSHIP_CACHE_MAX_USERS', 10000)),
+    'TTL': int(os.getenv('MEMBERSHIP_CACHE_TTL', 300)),
+}
+
+# Ограничения загружаемых изображений: размер файла в байтах (как
+# client_max_body_size в nginx) и размеры в пикселях, которые проверяются
+# по заголовку до декодирования.
+IMAGE_UPLOAD = {
+    'MAX_SIZE': int(os.getenv('IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)),
+    'MAX_DIMENSION': int(os.getenv('IMAGE_UPLOAD_MAX_DIMENSION', 8000)),
+    'MAX_PIXELS': int(os.getenv('IMAGE_UPLOAD_MAX_PIXELS', 40000000)),
+}
+
+# Уменьшенные копии загруженных изображений: ширины в пикселях, форматы
+# и число фоновых потоков (0 — строить копии сразу при сохранении).
+IMAGE_VARIANTS = {
+    'WIDTHS': tuple(
+        int(width) for width in
+        os.getenv('IMAGE_VARIANT_WIDTHS', '160,320,640,1280').split(',')
+    ),
+    'FORMATS': tuple(os.getenv('IMAGE_VARIANT_FORMATS', 'avif,webp').split(',')),
+    'QUALITY': int(os.getenv('IMAGE_VARIANT_QUALITY', 75)),
+    'WORKERS': int(os.getenv('IMAGE_VARIANT_WORKERS', 2)),
+}
+
+# Кеш ответов списка и страниц рецептов для анонимных пользователей:
+# алиас в CACHES, время жизни записи и max-age для nginx (секунды).
+RESPONSE_CACHE = {
+    'ALIAS': 'responses',
+    'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300)),
+    'MAX_AGE': int(os.getenv('RESPONSE_CACHE_MAX_AGE', 5)),
+}
+
+# Быстрый сериализатор (api.fast_serializers) для json-ответов списка
+# и страницы рецепта вместо RecipeSerializer.
+FAST_READ_SERIALIZERS = os.getenv('FAST_READ_SERIALIZERS', 'True') == 'True'
+
+# Лента подписок (api.feed): сколько последних рецептов хранится в ленте
+# пользователя и с какого числа подписчиков рецепты автора не
+# раскладываются по лентам при публикации, а подмешиваются при чтении.
+FEED = {
+    'MAX_ENTRIES': int(os.getenv('FEED_MAX_ENTRIES', 500)),
+    'FAN_OUT_LIMIT': int(os.getenv('FEED_FAN_OUT_LIMIT', 1000)),
+}
+
+# Асинхронные эндпоинты чтения (/api/async/): выполнять ли независимые
+# запросы к БД одновременно, каждый в своем потоке и соединении.
+ASYNC_READ = {
+    'PARALLEL_QUERIES': os.getenv('ASYNC_PARALLEL_QUERIES', 'True') == 'True',
+}
+
+# Замеры запросов (core.timing): заголовок Server-Timing, доля запросов,
+# которые пишутся в лог, и число одинаковых SQL-запросов, начиная с
+# которого запрос считается N+1. Выключенное middleware не подключается.
+REQUEST_TIMING = {
+    'ENABLED': os.getenv('REQUEST_TIMING', 'False') == 'True',
+    'LOG_SAMPLE_RATE': float(
+        os.getenv('REQUEST_TIMING_LOG_SAMPLE_RATE', 0.01)
+    ),
+    'DUPLICATE_QUERIES': int(
+        os.getenv('REQUEST_TIMING_DUPLICATE_QUERIES', 2)
+    ),
+}
+
+# Метрики для Prometheus (core.metrics, эндпоинт /metrics/): каталог для
+# снимков воркеров gunicorn (пустой — метрики только своего процесса),
+# период их записи, границы гистограмм и токен для доступа к эндпоинту.
+METRICS = {
+    'ENABLED': os.getenv('METRICS', 'False') == 'True',
+    'MULTIPROCESS_DIR': os.getenv('METRICS_MULTIPROCESS_DIR', ''),
+    'FLUSH_INTERVAL': float(os.getenv('METRICS_FLUSH_INTERVAL', 1)),
+    'LATENCY_BUCKETS': (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+    ),
+    'QUERY_BUCKETS': (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
+
+# Бюджеты для команды benchmark_api: превышение любого из лимитов
+# завершает команду с ошибкой.
+API_BENCHMARK_BUDGETS = {
+    'recipes-list': {'max_queries': 5},
+    'recipes-detail': {'max_queries': 4},
+    'recipes-feed': {'max_queries': 6},
+    'users-subscriptions': {'max_queries': 3},
+    'users-list': {'max_queries': 2},
+    'ingredients-search': {'max_queries': 0},
+    'download-shopping-cart': {'max_queries': 1},
+    'short-link': {'max_queries': 0},
+    'anonymous-recipes-list': {'max_queries': 0},
+    'anonymous-recipes-detail': {'max_queries': 0},
+}
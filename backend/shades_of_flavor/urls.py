@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import include, path
 
 from api.views import RecipeRedirectApiView
+from core.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,5 +11,6 @@ urlpatterns = [
         's/<str:short_link>/',
         RecipeRedirectApiView.as_view(),
         name='short-link',
-    )
+    ),
+    path('metrics/', metrics_view, name='metrics'),
 ]
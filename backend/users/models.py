@@ -2,12 +2,58 @@ from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-class CustomManager(BaseUserManager):
+class CustomUserQuerySet(models.QuerySet):
+    """Кверисет пользователей с флагом подписки."""
+
+    def with_subscription_flag(self, user):
+        """
+        Аннотирует пользователей флагом user_subscribed: подписан ли
+        на них переданный пользователь.
+        """
+        if not user.is_authenticated:
+            return self.annotate(user_subscribed=Value(False))
+        return self.annotate(
+            user_subscribed=Exists(
+                Subscription.objects.filter(
+                    subscriptions=OuterRef('pk'),
+                    subscribers=user,
+                )
+            )
+        )
+
+    def with_subscription_data(self, user, recipes_limit=None):
+        """
+        Готовит авторов для GetSubscriptionsSerializer: флаг подписки
+        и не более recipes_limit последних рецептов, отобранных в БД
+        оконной функцией.
+        """
+        from api.models import Recipe
+
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time',
+            'author_id', 'pub_date'
+        )
+        if recipes_limit is not None:
+            recipes = recipes.annotate(
+                author_rank=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=(F('pub_date').desc(), F('id').desc()),
+                )
+            ).filter(author_rank__lte=recipes_limit)
+        return self.with_subscription_flag(user).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        )
+
+
+class CustomManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     """Кастомный менеджер для управления пользователями."""
 
     def create_user(self, email, password=None, **extra_fields):
@@ -70,6 +116,20 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         null=True,
         default=None,
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='уменьшенные копии аватара',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='число рецептов',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='число подписчиков',
+    )
     is_superuser = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
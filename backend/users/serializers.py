@@ -2,14 +2,16 @@ from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
 from api.base_serializers import BaseRecipeSerializer
+from core.timing import TimedListSerializer, TimedSerializerMixin
 from users.models import CustomUser
-from users.utils import Base64ImageField
+from users.utils import Base64ImageField, ImageVariantsField
 
 
 class BaseCustomUserSerializer(UserSerializer):
     """Базовый сериализатор юзеров."""
 
     avatar = Base64ImageField(required=False, allow_null=True)
+    avatar_srcset = ImageVariantsField(source='avatar_variants')
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -21,10 +23,13 @@ class BaseCustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_srcset',
             'is_subscribed',
         ]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'user_subscribed'):
+            return obj.user_subscribed
         request = self.context['request']
         if request.user.is_authenticated:
             return obj.subscriptions.filter(
@@ -69,30 +74,20 @@ class UserAvatarSerializer(UserSerializer):
         return attrs
 
 
-class GetSubscriptionsSerializer(BaseCustomUserSerializer):
+class GetSubscriptionsSerializer(
+    TimedSerializerMixin, BaseCustomUserSerializer
+):
     """Сериализатор для подписок."""
 
     recipes = BaseRecipeSerializer(
         read_only=True,
         many=True
     )
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(BaseCustomUserSerializer.Meta):
         fields = BaseCustomUserSerializer.Meta.fields + [
             'recipes',
             'recipes_count',
         ]
-
-    def get_recipes_count(self, obj):
-        recipes = obj.recipes.all()
-        return recipes.count()
-
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        request = self.context['request']
-        limit = request.query_params.get('recipes_limit')
-
-        if limit:
-            representation['recipes'] = representation['recipes'][:int(limit)]
-        return representation
+        list_serializer_class = TimedListSerializer
@@ -0,0 +1,51 @@
+import base64
+import struct
+import zlib
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ValidationError
+
+from users.utils import Base64ImageField
+
+
+def png_header(width, height):
+    """PNG только с заголовком: размер без данных пикселей."""
+    def chunk(kind, data):
+        return (
+            struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data))
+        )
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+        + chunk(b'IEND', b'')
+    )
+
+
+class Base64ImageFieldTests(SimpleTestCase):
+    """Ограничения разрешения загружаемых изображений."""
+
+    def assert_too_many_pixels(self, width, height):
+        data = 'data:image/png;base64,' + base64.b64encode(
+            png_header(width, height)
+        ).decode()
+        field = Base64ImageField()
+        with self.assertRaises(ValidationError) as context:
+            field.run_validation(data)
+        self.assertEqual(
+            context.exception.detail[0],
+            field.error_messages['too_many_pixels'].format(
+                max_dimension=settings.IMAGE_UPLOAD['MAX_DIMENSION'],
+                max_pixels=settings.IMAGE_UPLOAD['MAX_PIXELS'],
+            ),
+        )
+
+    def test_too_many_pixels(self):
+        self.assert_too_many_pixels(
+            settings.IMAGE_UPLOAD['MAX_DIMENSION'] + 1, 100
+        )
+
+    def test_decompression_bomb(self):
+        # Pillow отказывается открывать изображение больше ~179 Мпикс.
+        self.assert_too_many_pixels(20000, 20000)
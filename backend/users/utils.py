@@ -1,22 +1,131 @@
 import base64
+import binascii
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
 from rest_framework import serializers
 
 from users.validators import subscription_creatable
 
+BASE64_MARKER = ';base64,'
+
+# Кратно 4, чтобы каждый кусок base64 декодировался отдельно.
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+    """
+    Временный файл с декодированным base64. Хранилище может переместить
+    его на место, поэтому при сборке мусора файл закрывается без ошибки
+    об уже удаленном временном файле.
+    """
+
+    def __del__(self):
+        self.close()
+
 
 class Base64ImageField(serializers.ImageField):
-    """Класс поля сериализатора для обработки изображений в формате base64."""
+    """
+    Класс поля сериализатора для изображений в формате base64 или файлом
+    из multipart/form-data.
+
+    Base64 декодируется частями во временный файл, а размер и разрешение
+    проверяются до полного декодирования изображения.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Некорректные данные изображения в base64.',
+        'too_large': 'Размер изображения превышает {max_size} байт.',
+        'too_many_pixels': (
+            'Изображение больше допустимого разрешения '
+            '{max_dimension}x{max_dimension} или {max_pixels} пикселей.'
+        ),
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
+            data = self.decode_base64(data)
+        if hasattr(data, 'size'):
+            self.check_limits(data)
+        return super().to_internal_value(data)
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+    def decode_base64(self, data):
+        limits = settings.IMAGE_UPLOAD
+        header_end = data.find(BASE64_MARKER)
+        if header_end == -1:
+            self.fail('invalid_base64')
+        start = header_end + len(BASE64_MARKER)
+        if (len(data) - start) * 3 // 4 > limits['MAX_SIZE']:
+            self.fail('too_large', max_size=limits['MAX_SIZE'])
+        ext = data[len('data:image/'):header_end]
+        file = DecodedImageFile('temp.' + ext, 'image/' + ext, 0, None)
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    data[offset:offset + BASE64_CHUNK_SIZE]
+                ))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        file.seek(0)
+        return file
 
-        return super().to_internal_value(data)
+    def check_limits(self, file):
+        """Проверяет размер файла и разрешение по заголовку изображения."""
+        limits = settings.IMAGE_UPLOAD
+        if file.size > limits['MAX_SIZE']:
+            self.fail('too_large', max_size=limits['MAX_SIZE'])
+        try:
+            # Image.open читает только заголовок; целостность проверит
+            # verify() в родительском поле.
+            width, height = Image.open(file).size
+        except Image.DecompressionBombError:
+            # Pillow сам отказывается открывать такие изображения.
+            self.fail(
+                'too_many_pixels',
+                max_dimension=limits['MAX_DIMENSION'],
+                max_pixels=limits['MAX_PIXELS'],
+            )
+        except Exception:
+            # Некорректный файл отклонит родительское поле.
+            return
+        finally:
+            file.seek(0)
+        if (
+            max(width, height) > limits['MAX_DIMENSION']
+            or width * height > limits['MAX_PIXELS']
+        ):
+            self.fail(
+                'too_many_pixels',
+                max_dimension=limits['MAX_DIMENSION'],
+                max_pixels=limits['MAX_PIXELS'],
+            )
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Поле с картой уменьшенных копий изображения в духе srcset:
+    {формат: {ширина: url}}. Пока копии не построены — пустой словарь.
+    """
+
+    def to_representation(self, value):
+        return srcset_urls(value, self.context.get('request'))
+
+
+def srcset_urls(variants, request=None):
+    """Переводит карту копий из поля *_variants в {формат: {ширина: url}}."""
+    srcset = {}
+    for fmt, paths in variants.get('srcset', {}).items():
+        srcset[fmt] = {}
+        for width, path in paths.items():
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            srcset[fmt][width] = url
+    return srcset
 
 
 def get_subscription_data(request, kwargs):
@@ -24,3 +133,11 @@ def get_subscription_data(request, kwargs):
     subscribed_user_id = kwargs['id']
     subscribed_user = subscription_creatable(user, subscribed_user_id)
     return user, subscribed_user
+
+
+def get_recipes_limit(request):
+    """Возвращает recipes_limit из запроса или None, если он не задан."""
+    limit = request.GET.get('recipes_limit', '')
+    if limit.isdigit():
+        return int(limit)
+    return None
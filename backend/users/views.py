@@ -1,23 +1,27 @@
 from django.conf import settings
+from django.db import transaction
 from djoser.views import UserViewSet
 from rest_framework import pagination, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from core.counters import lock_row
+from core.mixins import StreamingUploadMixin
 from core.permissions import (
     AuthenticatedOrReadOnlyRequest,
     IsAuthorAdminOrReadOnlyObject
 )
+from core.timing import TimedViewMixin
 from users.models import CustomUser, Subscription
 from users.serializers import (
     CustomUserSerializer,
     GetSubscriptionsSerializer,
     UserAvatarSerializer
 )
-from users.utils import get_subscription_data
+from users.utils import get_recipes_limit, get_subscription_data
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(TimedViewMixin, StreamingUploadMixin, UserViewSet):
     """Вьюсет пользователей."""
 
     queryset = CustomUser.objects.all()
@@ -35,7 +39,7 @@ class CustomUserViewSet(UserViewSet):
         return [permission() for permission in self.permission_classes]
 
     def list(self, request, *args, **kwargs):
-        queryset = CustomUser.objects.all()
+        queryset = CustomUser.objects.with_subscription_flag(request.user)
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -77,6 +81,8 @@ class CustomUserViewSet(UserViewSet):
         if request.user.is_authenticated:
             subscriptions = CustomUser.objects.filter(
                 subscriptions__subscribers=request.user
+            ).with_subscription_data(
+                request.user, get_recipes_limit(request)
             )
             paginator = pagination.PageNumberPagination()
             paginator.page_size = settings.SUBSCRIPTIONS_PAGE_SIZE
@@ -104,17 +110,24 @@ class CustomUserViewSet(UserViewSet):
     def create_subscription(self, request, *args, **kwargs):
         user, subscribed_user = get_subscription_data(request, kwargs)
 
-        if user.subscribers.filter(subscriptions=subscribed_user).exists():
-            return Response(
-                {'detail': 'Вы уже подписаны на данного пользователя.'},
-                status=status.HTTP_400_BAD_REQUEST
+        # Счетчик подписчиков автора меняет сигнал вставки подписки.
+        with transaction.atomic():
+            lock_row(CustomUser, user.pk)
+            if user.subscribers.filter(
+                subscriptions=subscribed_user
+            ).exists():
+                return Response(
+                    {'detail': 'Вы уже подписаны на данного пользователя.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            Subscription.objects.create(
+                subscriptions=subscribed_user,
+                subscribers=user
             )
-        Subscription.objects.create(
-            subscriptions=subscribed_user,
-            subscribers=user
-        )
         serializer = GetSubscriptionsSerializer(
-            subscribed_user,
+            CustomUser.objects.with_subscription_data(
+                user, get_recipes_limit(request)
+            ).get(pk=subscribed_user.pk),
             context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -122,13 +135,15 @@ class CustomUserViewSet(UserViewSet):
     @manage_subscription.mapping.delete
     def delete_subscription(self, request, *args, **kwargs):
         user, subscribed_user = get_subscription_data(request, kwargs)
-        subscription = user.subscribers.filter(
-            subscriptions=subscribed_user
-        ).first()
-        if not subscription:
-            return Response(
-                {'detail': 'Вы не подписаны на этого пользователя.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        subscription.delete()
+        with transaction.atomic():
+            lock_row(CustomUser, user.pk)
+            subscription = user.subscribers.filter(
+                subscriptions=subscribed_user
+            ).first()
+            if not subscription:
+                return Response(
+                    {'detail': 'Вы не подписаны на этого пользователя.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)